@@ -0,0 +1,162 @@
+import itertools
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Admission control for report builds. Every build that misses the report
+# cache asks for a slot with an estimated memory cost (board items, number
+# of detail sections, full vs. summary workbook); builds run while they fit
+# in the process's memory and concurrency budget and queue otherwise.
+#
+# The queue serves interactive requests (including the summary a report
+# job's user waits for) before batch work (the full workbook of a report
+# job, scheduled pre-generation) and, within a class, cheaper builds first. A
+# build that has waited longer than ADMISSION_AGING_SECONDS goes to the front
+# so large reports still get their turn; while it waits for room, nothing
+# behind it is let in. An interactive request that can't start within
+# ADMISSION_MAX_WAIT_SECONDS, or finds ADMISSION_MAX_QUEUE requests already
+# waiting, is turned away with a Retry-After instead; batch work just waits.
+#
+# The budget is per process: with several gunicorn workers, give each one
+# its share of the instance's memory.
+
+logger = logging.getLogger(__name__)
+
+MEMORY_BUDGET_BYTES = int(float(os.environ.get("ADMISSION_MEMORY_MB", 512)) * 2**20)
+MAX_CONCURRENT = int(os.environ.get("ADMISSION_MAX_CONCURRENT", 4))
+MAX_WAIT_SECONDS = float(os.environ.get("ADMISSION_MAX_WAIT_SECONDS", 20))
+MAX_QUEUE = int(os.environ.get("ADMISSION_MAX_QUEUE", 16))
+AGING_SECONDS = float(os.environ.get("ADMISSION_AGING_SECONDS", 60))
+
+# Rough peak memory of a build (see memory_profile.py for measuring it): a
+# fixed part, a part per board item (the Data sheet and the detail tables
+# dominate a full workbook) and a part per detail section
+BASE_BYTES = int(os.environ.get("ADMISSION_BASE_BYTES", 4 * 2**20))
+FULL_ITEM_BYTES = int(os.environ.get("ADMISSION_FULL_ITEM_BYTES", 8 * 1024))
+SUMMARY_ITEM_BYTES = int(os.environ.get("ADMISSION_SUMMARY_ITEM_BYTES", 2 * 1024))
+SECTION_BYTES = int(os.environ.get("ADMISSION_SECTION_BYTES", 64 * 1024))
+
+INTERACTIVE = 0
+BATCH = 1
+
+
+class AdmissionRejected(RuntimeError):
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def estimate_report_cost(boards, mirror, config, detail=True):
+    items = sum(mirror.item_count(board.id) for board in boards)
+    if not detail:
+        return BASE_BYTES + items * SUMMARY_ITEM_BYTES
+    # Departments, desks and the salesperson breakdown
+    sections = len(config.departments) + len(config.section_desks) + 1
+    return BASE_BYTES + items * FULL_ITEM_BYTES + sections * SECTION_BYTES
+
+
+class Ticket:
+    def __init__(self, cost, priority, seq):
+        self.cost = cost
+        self.priority = priority
+        self.seq = seq
+        self.queued_at = time.monotonic()
+
+    def order(self, now):
+        aged = now - self.queued_at >= AGING_SECONDS
+        return (-1 if aged else self.priority, self.cost, self.seq)
+
+
+class AdmissionController:
+    def __init__(self, memory_budget=MEMORY_BUDGET_BYTES, max_concurrent=MAX_CONCURRENT,
+                 max_wait=MAX_WAIT_SECONDS, max_queue=MAX_QUEUE):
+        self.memory_budget = memory_budget
+        self.max_concurrent = max_concurrent
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self.running = 0
+        self.reserved = 0
+        self.rejected = 0
+        self._waiting = []
+        self._seq = itertools.count()
+        self._build_seconds = 5.0   # moving average, for Retry-After
+        self._cond = threading.Condition()
+
+    def _head(self):
+        now = time.monotonic()
+        return min(self._waiting, key=lambda ticket: ticket.order(now))
+
+    def _fits(self, cost):
+        # A build bigger than the whole budget runs on its own
+        return self.running < self.max_concurrent and (self.reserved + cost <= self.memory_budget or not self.running)
+
+    def _retry_after(self):
+        queued = len(self._waiting) + self.running
+        return max(1, math.ceil(self._build_seconds * queued / self.max_concurrent))
+
+    def _reject(self, reason):
+        self.rejected += 1
+        retry_after = self._retry_after()
+        logger.warning("Report build turned away (%s); retry after %ds", reason, retry_after)
+        return AdmissionRejected(f"The server is busy with other reports ({reason}); try again shortly.", retry_after)
+
+    def _enter(self, cost, priority):
+        with self._cond:
+            if priority == INTERACTIVE and len(self._waiting) >= self.max_queue:
+                raise self._reject("queue full")
+
+            ticket = Ticket(cost, priority, next(self._seq))
+            deadline = ticket.queued_at + self.max_wait if priority == INTERACTIVE else None
+            self._waiting.append(ticket)
+            try:
+                while not (self._head() is ticket and self._fits(cost)):
+                    timeout = None if deadline is None else deadline - time.monotonic()
+                    if timeout is not None and timeout <= 0:
+                        raise self._reject("waited too long")
+                    self._cond.wait(timeout)
+            finally:
+                self._waiting.remove(ticket)
+                self._cond.notify_all()
+
+            self.running += 1
+            self.reserved += cost
+            return ticket
+
+    def _leave(self, cost, seconds):
+        with self._cond:
+            self.running -= 1
+            self.reserved -= cost
+            self._build_seconds = 0.8 * self._build_seconds + 0.2 * seconds
+            self._cond.notify_all()
+
+    @contextmanager
+    def admit(self, cost, priority=INTERACTIVE):
+        # Blocks until the build may run; raises AdmissionRejected for an
+        # interactive build that can't start soon enough
+        self._enter(cost, priority)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._leave(cost, time.monotonic() - started)
+
+    def status(self):
+        with self._cond:
+            return {
+                "ok": True,
+                "running": self.running,
+                "queued": len(self._waiting),
+                "reserved_mb": round(self.reserved / 2**20, 1),
+                "budget_mb": round(self.memory_budget / 2**20, 1),
+                "rejected": self.rejected,
+            }
+
+
+_controller = AdmissionController()
+
+
+def get_admission_controller():
+    return _controller
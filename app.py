@@ -1,37 +1,220 @@
-from flask import Flask, render_template, request, send_file
+from flask import Blueprint, Flask, abort, render_template, request, send_file, jsonify, url_for
 from datetime import datetime
-from sync import generate_report
+from zoneinfo import ZoneInfo
+from io import BytesIO
+from report_cache import get_deal_intervals, get_report
+from report_config import get_config
+from mirror import check_webhook_settings, event_ids, get_mirror, verify_webhook
+import admission
+import background
+import health
+import memory_profile
+import report_jobs
 import os
 
-app = Flask(__name__)
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
 
-@app.route('/')
+bp = Blueprint('reports', __name__)
+
+@bp.route('/')
 def index():
-    return render_template('index.html')
+    return render_template('index.html', boards=get_config().boards)
+
+def parse_as_of(value):
+    # Optional point in time for a reproducible past report; times without
+    # an offset are in the report config's timezone
+    if not value:
+        return None
+    as_of = datetime.fromisoformat(value)
+    if as_of.tzinfo is None:
+        as_of = as_of.replace(tzinfo=ZoneInfo(get_config().timezone))
+    return as_of.timestamp()
 
-@app.route('/generate_report', methods=['POST'])
+@bp.route('/generate_report', methods=['POST'])
 def generate_report_route():
     start_date_str = request.form['start_date']
     end_date_str = request.form['end_date']
+    board_ids = request.form.getlist('board_id') or None
+    # mode=summary skips the Data sheet and the department / desk /
+    # salesperson breakdowns, for a much faster headline-only workbook
+    summary_only = request.form.get('mode') == 'summary'
 
     try:
         start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
         end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
 
-        excel_buffer = generate_report(start_date, end_date)
+        as_of = parse_as_of(request.form.get('as_of'))
 
-        return send_file(
-            excel_buffer,
+        # profile=memory (or REPORT_MEMORY_PROFILE_RATE sampling) builds the
+        # report under the memory profiler; the profile's JSON is linked from
+        # the X-Memory-Profile response header
+        profile = None
+        if memory_profile.sampled(request.form.get('profile') == 'memory'):
+            data, profile = memory_profile.profile_report(start_date, end_date, board_ids,
+                                                          detail=not summary_only, as_of=as_of)
+        else:
+            data = get_report(start_date, end_date, board_ids=board_ids, detail=not summary_only, as_of=as_of)
+
+        suffix = '_summary' if summary_only else ''
+        response = send_file(
+            BytesIO(data),
             as_attachment=True,
-            download_name=f'monday_report_{start_date}_to_{end_date}.xlsx',
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+            download_name=f'monday_report_{start_date}_to_{end_date}{suffix}.xlsx',
+            mimetype=XLSX_MIMETYPE
         )
+        if profile:
+            profile_id = report_jobs.get_job_store().save_profile(profile)
+            response.headers['X-Memory-Profile'] = url_for('reports.report_memory_profile', profile_id=profile_id)
+        return response
+    except admission.AdmissionRejected as e:
+        # Over the build budget: ask the client to come back instead of
+        # queueing it behind everyone else
+        return str(e), 503, {'Retry-After': str(e.retry_after)}
     except Exception as e:
         # This will help debug if something goes wrong on the server
         return str(e)
 
+@bp.route('/reports/trend')
+def report_trend():
+    # Enquiries Movement counts for consecutive windows (weekly by default),
+    # e.g. /reports/trend?start_date=2024-01-01&end_date=2024-07-01&step_days=7&desk=EMEA
+    try:
+        start_date = datetime.strptime(request.args['start_date'], '%Y-%m-%d').date()
+        end_date = datetime.strptime(request.args['end_date'], '%Y-%m-%d').date()
+        step_days = max(int(request.args.get('step_days', 7)), 1)
+        intervals = get_deal_intervals(request.args.getlist('board_id') or None)
+    except (KeyError, ValueError) as e:
+        return jsonify(error=str(e)), 400
+
+    desk = request.args.get('desk')
+    if desk:
+        intervals = intervals.for_desk(desk)
+
+    windows = [
+        {'start_date': str(begin), 'end_date': str(end), 'counts': counts}
+        for begin, end, counts in intervals.windows(start_date, end_date, step_days)
+    ]
+    return jsonify(desk=desk, windows=windows)
+
+# Progressive reports: the summary workbook is downloadable as soon as it's
+# ready, the full one is attached to the same job when the detail is done
+
+def job_json(job):
+    job['urls'] = {
+        'status': url_for('reports.report_job', job_id=job['job_id']),
+        **{part: url_for('reports.report_job_part', job_id=job['job_id'], part=part) for part in job['parts']},
+    }
+    return job
+
+@bp.route('/reports/jobs', methods=['POST'])
+def start_report_job():
+    data = request.get_json(silent=True) or {}
+    try:
+        start_date = datetime.strptime(data.get('start_date') or request.form['start_date'], '%Y-%m-%d').date()
+        end_date = datetime.strptime(data.get('end_date') or request.form['end_date'], '%Y-%m-%d').date()
+        board_ids = data.get('board_ids') or request.form.getlist('board_id') or None
+        job_id = report_jobs.start_job(start_date, end_date, board_ids=board_ids)
+    except (KeyError, ValueError) as e:
+        return jsonify(error=str(e)), 400
+
+    job = job_json(report_jobs.get_job_store().get(job_id))
+    return jsonify(job), 202, {'Location': job['urls']['status']}
+
+@bp.route('/reports/jobs/<job_id>')
+def report_job(job_id):
+    job = report_jobs.get_job_store().get(job_id)
+    if job is None:
+        abort(404)
+    return jsonify(job_json(job))
+
+@bp.route('/reports/jobs/<job_id>/<part>.xlsx')
+def report_job_part(job_id, part):
+    job = report_jobs.get_job_store().get(job_id)
+    data = report_jobs.get_job_store().part(job_id, part) if job else None
+    if data is None:
+        abort(404)
+
+    suffix = '_summary' if part == 'summary' else ''
+    return send_file(
+        BytesIO(data),
+        as_attachment=True,
+        download_name=f"monday_report_{job['params']['start_date']}_to_{job['params']['end_date']}{suffix}.xlsx",
+        mimetype=XLSX_MIMETYPE
+    )
+
+@bp.route('/reports/profiles/<profile_id>.json')
+def report_memory_profile(profile_id):
+    profile = report_jobs.get_job_store().profile(profile_id)
+    if profile is None:
+        abort(404)
+    return jsonify(profile)
+
+@bp.route('/webhooks/monday', methods=['POST'])
+def monday_webhook():
+    if not verify_webhook(request.headers.get('Authorization')):
+        return 'Unauthorized', 401
+
+    payload = request.get_json(silent=True) or {}
+    if not isinstance(payload, dict):
+        return jsonify(error='Expected a JSON object.'), 400
+
+    # monday.com confirms a new webhook URL by asking us to echo a challenge
+    if 'challenge' in payload:
+        return jsonify(challenge=payload['challenge'])
+
+    event = payload.get('event')
+    if event is None:
+        return jsonify(ok=True)
+    try:
+        board_id, _ = event_ids(event)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+
+    configured = {board.id for board in get_config().boards}
+    if board_id in configured:
+        get_mirror().apply_event(event)
+
+    return jsonify(ok=True)
+
+@bp.route('/healthz')
+def healthz():
+    # Liveness only: the process is up and serving requests
+    return jsonify(ok=True)
+
+@bp.route('/readyz')
+def readyz():
+    ready, checks = health.readiness()
+    return jsonify(ok=ready, checks=checks), 200 if ready else 503
+
+@bp.route('/warmup', methods=['GET', 'POST'])
+def warmup():
+    # Crawls every unseeded board, so only callers with WARMUP_TOKEN may run it
+    if not health.warmup_authorized(request.headers.get('Authorization')):
+        return 'Unauthorized', 401
+    try:
+        timings = health.warm_up()
+    except Exception as e:
+        return jsonify(ok=False, error=str(e)), 503
+    return jsonify(ok=True, seconds=timings)
+
+def create_app():
+    app = Flask(__name__)
+    app.register_blueprint(bp)
+    check_webhook_settings()
+
+    # Keeps the local board mirror in sync with monday.com in the background,
+    # and pre-generates the scheduled report windows into the report cache.
+    # Under gunicorn.conf.py the workers elect one of them to do this instead.
+    if background.MODE == 'start':
+        background.start_background_jobs()
+        background.warm_imports()
+
+    return app
+
+app = create_app()
+
 if __name__ == '__main__':
     # This part is for running on your local machine if you want to test
-    # OnRender will use Gunicorn to run the app
+    # OnRender will use Gunicorn to run the app (see gunicorn.conf.py)
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port)
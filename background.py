@@ -0,0 +1,85 @@
+import importlib
+import logging
+import os
+import sys
+import threading
+import time
+
+from mirror import DB_PATH, start_reconciler
+from scheduler import start_scheduler
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines
+    fcntl = None
+
+# The mirror reconciler and the report scheduler should run once per
+# instance, not once per gunicorn worker. REPORT_BACKGROUND_JOBS picks how:
+#   start - start them in this process (python app.py, single worker)
+#   elect - every worker waits on an exclusive lock file and only the holder
+#           runs them; if that worker exits, another one takes over
+#   off   - don't run them at all
+# gunicorn.conf.py switches to "elect" and calls elect() after each fork.
+
+logger = logging.getLogger(__name__)
+
+MODE = os.environ.get("REPORT_BACKGROUND_JOBS", "start")
+LOCK_PATH = os.environ.get("REPORT_BACKGROUND_LOCK_PATH", DB_PATH + ".jobs.lock")
+ELECTION_SECONDS = int(os.environ.get("REPORT_BACKGROUND_ELECTION_SECONDS", 5))
+
+# The report stack (pandas, openpyxl, requests) isn't imported when the app
+# starts; unless REPORT_WARM_IMPORTS=0 it's loaded in a background thread
+# right after boot so the first report doesn't pay for it either.
+WARM_IMPORTS = os.environ.get("REPORT_WARM_IMPORTS", "1") != "0"
+HEAVY_MODULES = ("sync", "requests")
+
+_started = False
+_lock_file = None
+
+
+def start_background_jobs():
+    global _started
+    if _started:
+        return
+    _started = True
+    start_reconciler()
+    start_scheduler()
+
+
+def import_heavy_modules():
+    started = time.monotonic()
+    for name in HEAVY_MODULES:
+        importlib.import_module(name)
+    logger.info("Report modules loaded in %.2fs", time.monotonic() - started)
+
+
+def warm_imports():
+    if not WARM_IMPORTS or all(name in sys.modules for name in HEAVY_MODULES):
+        return
+    threading.Thread(target=import_heavy_modules, name="warm-imports", daemon=True).start()
+
+
+def _election_loop():
+    global _lock_file
+    lock_file = open(LOCK_PATH, "a")
+    while True:
+        # Non-blocking + sleep rather than a blocking flock, so this also
+        # behaves under gevent workers
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            time.sleep(ELECTION_SECONDS)
+            continue
+
+        # The lock is held until this process exits
+        _lock_file = lock_file
+        logger.info("Worker %s runs the background jobs", os.getpid())
+        start_background_jobs()
+        return
+
+
+def elect():
+    if fcntl is None:
+        start_background_jobs()
+        return
+    threading.Thread(target=_election_loop, name="background-election", daemon=True).start()
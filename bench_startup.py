@@ -0,0 +1,73 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Cold-start check: imports the app in a fresh interpreter (as Render does
+# after an idle spin-down) and times how long until the landing page is
+# served. Fails if the median is over budget or if the report stack
+# (pandas, openpyxl, requests) got pulled into startup again.
+#
+#   python bench_startup.py                 # 5 runs, 1s budget
+#   python bench_startup.py --runs 10 --budget 0.8
+
+HEAVY_MODULES = ("sync", "pandas", "openpyxl", "requests")
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+response = app.app.test_client().get("/")
+served = time.perf_counter()
+print(json.dumps({
+    "import": imported - started,
+    "first_page": served - started,
+    "status": response.status_code,
+    "heavy": [name for name in HEAVY_MODULES if name in sys.modules],
+}))
+"""
+
+
+def run_once():
+    env = dict(os.environ, REPORT_BACKGROUND_JOBS="off", REPORT_WARM_IMPORTS="0")
+    code = f"HEAVY_MODULES = {HEAVY_MODULES!r}\n{PROBE}"
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time app cold start")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=float(os.environ.get("STARTUP_BUDGET_SECONDS", 1.0)),
+                        help="max median seconds to the first landing page")
+    args = parser.parse_args(argv)
+
+    runs = [run_once() for _ in range(args.runs)]
+    import_median = statistics.median(run["import"] for run in runs)
+    page_median = statistics.median(run["first_page"] for run in runs)
+    print(f"import app:      median {import_median:.3f}s")
+    print(f"first page (/):  median {page_median:.3f}s  (budget {args.budget:.2f}s)")
+
+    failed = False
+    heavy = sorted({name for run in runs for name in run["heavy"]})
+    if heavy:
+        print(f"FAIL: imported at startup: {', '.join(heavy)}", file=sys.stderr)
+        failed = True
+    if any(run["status"] != 200 for run in runs):
+        print("FAIL: landing page did not return 200", file=sys.stderr)
+        failed = True
+    if page_median > args.budget:
+        print("FAIL: startup over budget", file=sys.stderr)
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+import json
+import logging
+import os
+import threading
+
+import pandas as pd
+
+from mirror import DB_PATH
+
+# Board snapshots shared by the gunicorn workers (optional, needs pyarrow).
+# Each board's item table, as load_board_items reads it from the mirror, is
+# written once per board version to an uncompressed Arrow IPC file. Workers
+# memory-map the file read-only and build the report frame on top of the
+# mapped buffers: the text columns become Arrow-backed pandas strings over
+# the mapping, so they are neither re-decoded from SQLite/JSON per report
+# nor held as a private copy in every worker, and their pages are shared
+# through the OS page cache. Columns a report derives from them (parsed
+# dates, flags) and the item ID -> position map are still per worker. A new
+# version is written to a temporary file and renamed over the old one;
+# frames still using the old mapping keep it alive until they are dropped,
+# and the next load maps the new file.
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+# Empty disables the snapshots (reports read the mirror directly)
+SNAPSHOT_DIR = os.environ.get(
+    "BOARD_SNAPSHOT_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(DB_PATH)), "board_snapshots"),
+)
+
+POSITION_COLUMN = "__position__"
+METADATA_KEY = b"board_snapshot"
+
+
+def enabled():
+    return pa is not None and bool(SNAPSHOT_DIR)
+
+
+def _describe(board, version):
+    # Stored with the file: a snapshot is only valid for this board version
+    # and this board config (name, column renames)
+    return {"board_id": board.id, "version": version, "board": board.name, "columns": board.columns}
+
+
+class SnapshotStore:
+    def __init__(self, directory):
+        self.directory = directory
+        self._mapped = {}   # board id -> (description, table)
+        self._lock = threading.Lock()
+
+    def path(self, board_id):
+        return os.path.join(self.directory, f"board_{board_id}.arrow")
+
+    def table(self, board, mirror):
+        # The board's snapshot at the mirror's current version, mapped
+        version = mirror.version(board.id)
+        expected = _describe(board, version)
+        mapped = self._mapped.get(board.id)
+        if mapped and mapped[0] == expected:
+            return mapped[1]
+
+        with self._lock:
+            mapped = self._mapped.get(board.id)
+            if mapped and mapped[0] == expected:
+                return mapped[1]
+            table = self._map(board.id, expected)
+            if table is None:
+                # Versions are read before the items, like the report model
+                # does, so a write racing the export only causes a rewrite
+                self._write(board, mirror, expected)
+                table = self._map(board.id, expected)
+            self._mapped[board.id] = (expected, table)
+            return table
+
+    def _map(self, board_id, expected):
+        try:
+            source = pa.memory_map(self.path(board_id), "r")
+        except FileNotFoundError:
+            return None
+        table = pa.ipc.open_file(source).read_all()
+        metadata = table.schema.metadata or {}
+        if METADATA_KEY not in metadata or json.loads(metadata[METADATA_KEY]) != expected:
+            return None  # another version / config; rewritten by the caller
+        return table
+
+    def _write(self, board, mirror, description):
+        from sync import ColumnBuffers, load_board_items
+
+        buffers = ColumnBuffers()
+        positions = {}
+        load_board_items(board, mirror, buffers, positions)
+        columns = {
+            title: pa.array(values + [None] * (buffers.length - len(values)), type=pa.large_string())
+            for title, values in buffers.columns.items()
+        }
+        columns[POSITION_COLUMN] = pa.array([position for _, position, _ in positions.values()], type=pa.int64())
+        table = pa.table(columns).replace_schema_metadata({METADATA_KEY: json.dumps(description)})
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(board.id)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with pa.OSFile(temp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        logger.info("Board %s snapshot written at version %s (%d items)", board.id, description["version"], len(table))
+
+    def load_frame(self, boards, mirror, positions=None):
+        # Same frame as sync.load_boards_frame builds from the mirror
+        tables = []
+        for index, board in enumerate(boards):
+            table = self.table(board, mirror)
+            if positions is not None:
+                item_ids = table.column("Item ID").to_pylist() if "Item ID" in table.column_names else []
+                for item_id, position in zip(item_ids, table.column(POSITION_COLUMN).to_pylist()):
+                    positions[item_id] = (index, position, item_id)
+            tables.append(table.drop_columns([POSITION_COLUMN]).replace_schema_metadata(None))
+
+        tables = [table for table in tables if len(table)]
+        if not tables:
+            return pd.DataFrame()
+        table = pa.concat_tables(tables, promote_options="default")
+        # pandas' default str dtype when pyarrow is installed, spelled out:
+        # object columns would copy every value into a Python str
+        string_dtype = pd.StringDtype("pyarrow", na_value=float("nan"))
+        df = table.to_pandas(types_mapper={pa.large_string(): string_dtype}.get)
+        # Columns with no values at all come out of the mirror as object
+        # columns of None, not as empty string columns
+        for title in df.columns:
+            if table.column(title).null_count == len(table):
+                df[title] = pd.Series([None] * len(df), index=df.index, dtype=object)
+        return df
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_snapshot_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = SnapshotStore(SNAPSHOT_DIR)
+    return _store
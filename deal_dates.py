@@ -0,0 +1,91 @@
+import logging
+import re
+import threading
+from collections import Counter
+from datetime import date, datetime
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Date columns as monday.com renders them as text: "2024-06-03", with an
+# optional time ("2024-06-03 09:30", "2024-06-03 09:30:15") and zone
+# ("2024-06-03 09:30:15 UTC"). Only the calendar date is kept, as written.
+# A board has few distinct dates, so each distinct text is parsed once (and
+# memoised across reports) and the results are broadcast back to the rows.
+# Text that isn't empty but doesn't parse is counted and logged rather than
+# quietly turned into a missing date.
+
+logger = logging.getLogger(__name__)
+
+DATE_TEXT = re.compile(
+    r"\s*(\d{4})-(\d{1,2})-(\d{1,2})"
+    r"(?:[ T]\d{1,2}:\d{2}(?::\d{2}(?:\.\d+)?)?\s*(?:UTC|GMT|Z|[+-]\d{2}:?\d{2})?)?\s*"
+)
+
+INVALID = object()
+
+# column -> distinct texts that didn't parse, since the process started.
+# Counted once each: builds re-parse the same rows, and incremental updates
+# only a few of them, so a row count would say nothing.
+unparsed = Counter()
+_unparsed_seen = set()
+_unparsed_lock = threading.Lock()
+
+
+@lru_cache(maxsize=16384)
+def parse_date_text(text):
+    # date, None for blank text, or INVALID
+    if not text or text.isspace():
+        return None
+    match = DATE_TEXT.fullmatch(text)
+    if not match:
+        return INVALID
+    try:
+        return date(*map(int, match.groups()))
+    except ValueError:   # e.g. 2024-02-30
+        return INVALID
+
+
+def parse_dates(values, column=None):
+    # values -> object Series of datetime.date, NaT where missing/invalid
+    values = pd.Series(values)
+    codes, uniques = pd.factorize(values)
+    parsed = [parse_date_text(text) if isinstance(text, str) else _parse_other(text) for text in uniques]
+
+    lookup = np.empty(len(parsed) + 1, dtype=object)
+    lookup[:] = pd.NaT  # the last slot is code -1: None / NaN
+    bad = []
+    for i, result in enumerate(parsed):
+        if result is INVALID:
+            bad.append(i)
+        elif result is not None:
+            lookup[i] = result
+
+    if bad:
+        counts = np.bincount(codes[codes >= 0], minlength=len(parsed))
+        _report_invalid(column, Counter({str(uniques[i]): int(counts[i]) for i in bad}))
+
+    return pd.Series(lookup[codes], index=values.index, dtype=object)
+
+
+def _parse_other(value):
+    # Frames built elsewhere may already hold dates / timestamps
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return INVALID
+
+
+def _report_invalid(column, invalid):
+    rows = sum(invalid.values())
+    with _unparsed_lock:
+        new = [text for text in invalid if (column, text) not in _unparsed_seen]
+        _unparsed_seen.update((column, text) for text in new)
+        unparsed[column] += len(new)
+    if new:
+        logger.warning(
+            "%s: %d row(s) with unrecognised dates, e.g. %s",
+            column, rows, ", ".join(repr(text) for text in new[:5]),
+        )
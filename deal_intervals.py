@@ -0,0 +1,180 @@
+import numpy as np
+import pandas as pd
+
+# Deal lifetimes as sorted date arrays, built once per board snapshot, so the
+# movement questions ("active at t", "added / removed in [begin, end)") are a
+# couple of searchsorted calls instead of full-frame masks per window. The
+# rules are the ones compute_flags applies per item:
+#
+#   active at t           created < t and Active, or not Active and closed >= t
+#   active before t       created < t and (Active, or not Active and closed >= t)
+#   added in [b, e)       b <= created < e
+#   removed in [b, e)     b <= closed < e
+#
+# Missing dates never match, like NaT in the pandas comparisons.
+
+
+def to_days(values):
+    return pd.to_datetime(pd.Series(values, dtype=object), errors="coerce").to_numpy("datetime64[D]")
+
+
+def _day(value):
+    return np.datetime64(value, "D")
+
+
+class SortedDates:
+    # The rows selected by mask, ordered by date: counts for a bound are a
+    # searchsorted, and the matching rows are a contiguous slice of `rows`.
+
+    def __init__(self, dates, mask):
+        selected = np.flatnonzero(mask)
+        order = np.argsort(dates[selected], kind="stable")
+        self.rows = selected[order]
+        self.dates = dates[self.rows]
+
+    def __len__(self):
+        return len(self.rows)
+
+    def count_before(self, day):
+        return int(np.searchsorted(self.dates, day, "left"))
+
+    def rows_before(self, day):
+        return self.rows[:self.count_before(day)]
+
+    def rows_from(self, day):
+        return self.rows[self.count_before(day):]
+
+    def rows_between(self, begin, end):
+        return self.rows[self.count_before(begin):self.count_before(end)]
+
+
+class DealIntervals:
+    def __init__(self, ids, created, closed, active, potential=None, desks=None):
+        self.ids = np.asarray(ids, dtype=object)
+        self.created = np.asarray(created, dtype="datetime64[D]")
+        self.closed = np.asarray(closed, dtype="datetime64[D]")
+        self.active = np.asarray(active, dtype=bool)
+        self.potential = None if potential is None else np.asarray(potential, dtype=object)
+        self.desks = None if desks is None else np.asarray(desks, dtype=object)
+
+        has_created = ~np.isnat(self.created)
+        has_closed = ~np.isnat(self.closed)
+        inactive = ~self.active
+        # Closed deals whose close date isn't before their creation date; a
+        # close date before creation can never satisfy created < t <= closed
+        spans = has_created & has_closed & inactive & (self.closed >= self.created)
+
+        self._created = SortedDates(self.created, has_created)
+        self._closed = SortedDates(self.closed, has_closed)
+        self._active_created = SortedDates(self.created, has_created & self.active)
+        self._inactive_closed = SortedDates(self.closed, has_closed & inactive)
+        self._span_created = SortedDates(self.created, spans)
+        self._span_closed = SortedDates(self.closed, spans)
+        self._subsets = {}
+
+    @classmethod
+    def from_frame(cls, df, desks=None):
+        # df as compute_flags sees it: dates already parsed to datetime.date
+        return cls(
+            df["Item ID"].to_numpy(dtype=object),
+            to_days(df["Deal creation date"]),
+            to_days(df["Close Date"]),
+            (df["Group Status"] == "Active").to_numpy(),
+            potential=df["Potential"].to_numpy(dtype=object),
+            desks=desks,
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    def subset(self, mask):
+        mask = np.asarray(mask, dtype=bool)
+        return DealIntervals(
+            self.ids[mask], self.created[mask], self.closed[mask], self.active[mask],
+            potential=None if self.potential is None else self.potential[mask],
+            desks=None if self.desks is None else self.desks[mask],
+        )
+
+    def for_potential(self, potential):
+        return self._cached_subset(("potential", potential), self.potential == potential)
+
+    def for_desk(self, desk):
+        return self._cached_subset(("desk", desk), self.desks == desk)
+
+    def _cached_subset(self, key, mask):
+        if key not in self._subsets:
+            self._subsets[key] = self.subset(mask)
+        return self._subsets[key]
+
+    # --- Counts, O(log n) each
+
+    def active_at(self, day):
+        day = _day(day)
+        return (self._active_created.count_before(day)
+                + len(self._inactive_closed) - self._inactive_closed.count_before(day))
+
+    def active_before(self, day):
+        # Closed deals alive at `day` are those created before it minus those
+        # also closed before it (every span closes on or after its creation)
+        day = _day(day)
+        return (self._active_created.count_before(day)
+                + self._span_created.count_before(day) - self._span_closed.count_before(day))
+
+    def added(self, begin, end):
+        begin, end = _day(begin), _day(end)
+        return max(self._created.count_before(end) - self._created.count_before(begin), 0)
+
+    def removed(self, begin, end):
+        begin, end = _day(begin), _day(end)
+        return max(self._closed.count_before(end) - self._closed.count_before(begin), 0)
+
+    # --- Members, O(log n + k) (active_before_ids: see there)
+
+    def active_at_ids(self, day):
+        day = _day(day)
+        rows = np.concatenate([self._active_created.rows_before(day), self._inactive_closed.rows_from(day)])
+        return self.ids[np.sort(rows)]
+
+    def active_before_ids(self, day):
+        # The spans alive at `day` are those created before it and closed on
+        # or after it. Neither order alone gives them as one slice, so filter
+        # whichever of the two sets is smaller: O(log n + min(created before,
+        # closed from)), which is k unless many spans lie on either side.
+        day = _day(day)
+        created = self._span_created.rows_before(day)
+        closed = self._span_closed.rows_from(day)
+        if len(created) <= len(closed):
+            spans = created[self.closed[created] >= day]
+        else:
+            spans = closed[self.created[closed] < day]
+        return self.ids[np.sort(np.concatenate([self._active_created.rows_before(day), spans]))]
+
+    def added_ids(self, begin, end):
+        return self.ids[np.sort(self._created.rows_between(_day(begin), _day(end)))]
+
+    def removed_ids(self, begin, end):
+        return self.ids[np.sort(self._closed.rows_between(_day(begin), _day(end)))]
+
+    # --- Report windows
+
+    def window(self, begin, end):
+        # Same labels as the Enquiries Movement table
+        counts = {
+            "This Week": self.active_at(end),
+            "Last Week": self.active_before(begin),
+            "Addition (+)": self.added(begin, end),
+            "Removal (-)": self.removed(begin, end),
+        }
+        if self.potential is not None:
+            counts["Hot"] = self.for_potential("Hot").active_at(end)
+            counts["Cold"] = self.for_potential("Cold").active_at(end)
+        return counts
+
+    def windows(self, begin, end, step_days=7):
+        # Consecutive [begin, begin + step) windows up to end, e.g. a weekly trend
+        step = np.timedelta64(step_days, "D")
+        start, stop = _day(begin), _day(end)
+        while start < stop:
+            window_end = min(start + step, stop)
+            yield start.item(), window_end.item(), self.window(start, window_end)
+            start = window_end
@@ -0,0 +1,153 @@
+import logging
+import os
+import threading
+
+# Optional DuckDB backend for the report model (REPORT_BACKEND=duckdb). The
+# flagged board frame is scanned in place by DuckDB, and the movement counts,
+# matrices, referral totals and section memberships come out of a handful of
+# vectorised, multi-threaded SQL aggregations instead of the per-item
+# contribution loop in sync.item_contributions. Incremental updates still go
+# through the pandas path; the model ends up in exactly the same state.
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+logger = logging.getLogger(__name__)
+
+BACKEND = os.environ.get("REPORT_BACKEND", "pandas")
+# 0 = DuckDB's default (all cores)
+THREADS = int(os.environ.get("REPORT_DUCKDB_THREADS", 0))
+MEMORY_LIMIT = os.environ.get("REPORT_DUCKDB_MEMORY_LIMIT")
+
+_local = threading.local()
+_warned = False
+
+
+def enabled():
+    global _warned
+    if BACKEND != "duckdb":
+        return False
+    if duckdb is None:
+        if not _warned:
+            logger.warning("REPORT_BACKEND=duckdb but duckdb is not installed; using pandas")
+            _warned = True
+        return False
+    return True
+
+
+def _connect():
+    # In-memory database, one connection per thread
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = duckdb.connect(":memory:")
+        if THREADS:
+            conn.execute(f"SET threads = {THREADS}")
+        if MEMORY_LIMIT:
+            conn.execute(f"SET memory_limit = '{MEMORY_LIMIT}'")
+        _local.conn = conn
+    return conn
+
+
+# Column names as the SQL below sees them
+FRAME_COLUMNS = {
+    "Item ID": "item_id",
+    "Board": "board",
+    "Country/Region": "country",
+    "Potential": "potential",
+    "Referral Source Category": "source",
+    "Group Status": "status",
+    "Salesperson": "salesperson",
+    "Dept": "dept",
+}
+
+
+def aggregate(model, df_data, flags):
+    # Fills model.counts and model.sections for df_data (already flagged by
+    # compute_flags); flags are the MOVEMENT_METRICS flag columns
+    from sync import classify_desks
+
+    config = model.config
+    items = df_data[list(FRAME_COLUMNS) + flags].rename(columns=FRAME_COLUMNS)
+    items["desk"] = classify_desks(df_data["Country/Region"], config).to_numpy()
+
+    conn = _connect()
+    conn.register("items", items)
+    try:
+        _movement_counts(conn, model, flags)
+        _matrices(conn, model)
+        _referral(conn, model)
+        _sections(conn, model)
+    finally:
+        conn.unregister("items")
+
+
+def _movement_counts(conn, model, flags):
+    sums = ", ".join(f'SUM("{flag}") AS "{flag}"' for flag in flags)
+    rows = conn.execute(f"SELECT board, {sums} FROM items GROUP BY GROUPING SETS ((), (board))").fetchall()
+    for board, *totals in rows:
+        counter = model.counts[("count", board)]
+        for flag, total in zip(flags, totals):
+            if total:
+                counter[flag] = int(total)
+
+
+def _matrices(conn, model):
+    rows = conn.execute(
+        """
+        SELECT GROUPING(board) = 0 AS by_board, board, country, potential, COUNT(*)
+        FROM items
+        WHERE "IsActiveNow" = 1 AND potential IS NOT NULL AND country IS NOT NULL
+        GROUP BY GROUPING SETS ((country, potential), (board, country, potential))
+        """
+    ).fetchall()
+    for by_board, board, country, potential, count in rows:
+        model.counts[("country_matrix", board if by_board else None)][(country, potential)] = count
+
+    rows = conn.execute(
+        """
+        SELECT GROUPING(board) = 0 AS by_board, board, desk, potential, COUNT(*)
+        FROM items
+        WHERE "IsActiveNow" = 1 AND potential IS NOT NULL
+        GROUP BY GROUPING SETS ((desk, potential), (board, desk, potential))
+        """
+    ).fetchall()
+    for by_board, board, desk, potential, count in rows:
+        model.counts[("desk_matrix", board if by_board else None)][(desk, potential)] = count
+
+
+def _referral(conn, model):
+    rows = conn.execute(
+        """
+        SELECT source, COUNT(*), COUNT(*) FILTER (WHERE status = 'Won')
+        FROM items WHERE source IS NOT NULL GROUP BY source
+        """
+    ).fetchall()
+    counter = model.counts[("referral",)]
+    for source, total, won in rows:
+        counter[(source, "Total")] = total
+        if won:
+            counter[(source, "Won")] = won
+
+
+def _sections(conn, model):
+    config = model.config
+    active = '"IsActiveNow" = 1'
+    sections = {
+        "added": '"AdditionAfterCutoff" = 1',
+        "removed": '"RemovalAfterCutoff" = 1',
+        "sales": f"{active} AND salesperson IS NOT NULL",
+    }
+    params = []
+    for name, pattern in config.departments:
+        sections[("dept", name)] = f"{active} AND regexp_matches(COALESCE(dept, ''), ?, 'i')"
+        params.append(pattern.pattern)
+    for desk in config.section_desks:
+        sections[("desk", desk)] = f"{active} AND desk = ?"
+        params.append(desk)
+
+    lists = ", ".join(f"LIST(item_id) FILTER (WHERE {condition})" for condition in sections.values())
+    (members,) = conn.execute(f"SELECT {lists} FROM items", params).fetchall()
+    for section, ids in zip(sections, members):
+        if ids:
+            model.sections[section].update(ids)
@@ -0,0 +1,52 @@
+import os
+
+# Gunicorn settings. gunicorn reads ./gunicorn.conf.py on its own, so the
+# plain `gunicorn app:app` start command picks this up; every value can be
+# overridden from the environment.
+
+wsgi_app = "app:app"
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+# Reports spend most of their time waiting on SQLite / monday.com, so a few
+# threads per worker serve more concurrent reports than extra processes
+# would, without another copy of pandas per process. gevent also works
+# (GUNICORN_WORKER_CLASS=gevent, with gevent installed).
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", 100))
+
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 120))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 0))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 0))
+
+# Load the app once in the master so the workers share its imports
+# (pandas, openpyxl, ...) copy-on-write instead of each importing them.
+# The app itself imports them lazily; when_ready below loads them into the
+# master before the workers are forked.
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") != "0"
+
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG", "-")
+loglevel = os.environ.get("GUNICORN_LOG_LEVEL", "info")
+
+# Background jobs (mirror reconciler, report scheduler) must not start in
+# the master before the fork; the workers elect one of them to run them
+os.environ.setdefault("REPORT_BACKGROUND_JOBS", "elect")
+
+
+def when_ready(server):
+    import background
+
+    if server.cfg.preload_app and background.WARM_IMPORTS:
+        background.import_heavy_modules()
+
+
+def post_fork(server, worker):
+    import background
+
+    if background.MODE == "elect":
+        background.elect()
+    # Nothing to do when the master already loaded them (preload)
+    background.warm_imports()
@@ -0,0 +1,113 @@
+import hmac
+import logging
+import os
+import sys
+import threading
+import time
+
+import admission
+import background
+import monday_client
+from mirror import get_mirror
+from report_cache import get_report_cache
+from report_config import get_config
+
+# Liveness / readiness / warm-up checks behind /healthz, /readyz and /warmup.
+# Readiness only looks at local state (SQLite, the process's HTTP pool) so
+# platform probes stay cheap; /warmup is the one that talks to monday.com.
+
+logger = logging.getLogger(__name__)
+
+# A board snapshot older than this makes /readyz fail (0 = don't check age)
+READY_MAX_SNAPSHOT_AGE_SECONDS = int(os.environ.get("READY_MAX_SNAPSHOT_AGE_SECONDS", 3600))
+# /warmup wants "Authorization: Bearer <WARMUP_TOKEN>"; unset turns it off
+WARMUP_TOKEN = os.environ.get("WARMUP_TOKEN")
+
+_warmup_lock = threading.Lock()
+
+
+def client_status():
+    # The session is informational: under gunicorn only the worker running
+    # the background jobs (or the one that served /warmup) opens one, and the
+    # others serve reports from the mirror just as well. A probe must not
+    # open it (and import requests) itself either.
+    configured = bool(os.environ.get("MONDAY_API_KEY"))
+    return {
+        "ok": configured,
+        "api_key": configured,
+        "session": monday_client.session_ready(),
+        "pool_size": monday_client.HTTP_POOL_SIZE,
+        "complexity": monday_client.get_complexity_budget().status(),
+    }
+
+
+def snapshot_status(config, mirror):
+    now = time.time()
+    boards = {}
+    for board in config.boards:
+        synced_at = mirror.synced_at(board.id)
+        age = None if synced_at is None else round(now - synced_at, 1)
+        fresh = age is not None and (READY_MAX_SNAPSHOT_AGE_SECONDS <= 0 or age <= READY_MAX_SNAPSHOT_AGE_SECONDS)
+        boards[board.name] = {
+            "ok": fresh,
+            "age_seconds": age,
+            "version": mirror.version(board.id),
+            "crawl_items": mirror.crawl_progress(board.id),
+        }
+    return {"ok": all(board["ok"] for board in boards.values()), "boards": boards}
+
+
+def date_parsing_status():
+    # Informational: date texts that didn't parse since startup. deal_dates
+    # (pandas) is only loaded once a report has run, so don't import it here.
+    deal_dates = sys.modules.get("deal_dates")
+    return {"ok": True, "unparsed_values": dict(deal_dates.unparsed) if deal_dates else {}}
+
+
+def readiness():
+    config = get_config()
+    checks = {
+        "monday_client": client_status(),
+        "snapshot": snapshot_status(config, get_mirror()),
+        "report_cache": get_report_cache().status(),
+        "date_parsing": date_parsing_status(),
+        "admission": admission.get_admission_controller().status(),
+    }
+    return all(check["ok"] for check in checks.values()), checks
+
+
+def _timed(timings, step, fn, *args):
+    started = time.monotonic()
+    result = fn(*args)
+    timings[step] = round(time.monotonic() - started, 3)
+    return result
+
+
+def warmup_authorized(authorization):
+    if not WARMUP_TOKEN or not authorization:
+        return False
+    scheme, _, token = authorization.partition(" ")
+    return scheme.lower() == "bearer" and hmac.compare_digest(token.strip().encode(), WARMUP_TOKEN.encode())
+
+
+def warm_up():
+    # Pays the first-request costs up front: report imports, a live API
+    # connection, the column ID -> title map and a seeded, current mirror
+    with _warmup_lock:
+        config = get_config()
+        mirror = get_mirror()
+        api_key = monday_client.get_api_key()
+        board_ids = [board.id for board in config.boards]
+        timings = {}
+
+        _timed(timings, "imports", background.import_heavy_modules)
+        if not _timed(timings, "session", monday_client.ping, api_key):
+            raise monday_client.MondayAPIError("monday.com did not answer the warm-up query")
+        _timed(timings, "columns", lambda: [
+            mirror.sync_columns(board_id, api_key) for board_id in board_ids if not mirror.column_count(board_id)
+        ])
+        _timed(timings, "snapshot", mirror.ensure_boards_synced, board_ids)
+        _timed(timings, "stale_items", mirror.refresh_stale, api_key)
+
+        logger.info("Warm-up finished: %s", timings)
+        return timings
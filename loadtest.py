@@ -0,0 +1,402 @@
+import argparse
+import http.client
+import itertools
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from urllib.parse import urlencode
+
+import mock_monday
+
+# Capacity check: runs the app under gunicorn (gunicorn.conf.py) against the
+# mock monday.com API (mock_monday.py) and drives POST /generate_report with
+# a growing number of concurrent users. For every concurrency level it
+# records p50 / p95 / p99 latency, the error rate, throughput and the RSS of
+# each gunicorn worker, and saves the run as JSON. With --baseline (an
+# earlier run's JSON) it fails when p95 latency or the error rate regress,
+# so a capacity drop shows up before a deploy.
+#
+# By default every request asks for a date range nobody asked for before,
+# so each one builds its report and the numbers are build capacity. With
+# --ranges N the users cycle N ranges instead; repeats are mostly report
+# cache hits, and builds and repeats are reported separately.
+#
+#   python loadtest.py                                     # 1,2,4,8 users, 20s each
+#   python loadtest.py --items 20000 --latency 0.2 --concurrency 1,4,16 --duration 30
+#   python loadtest.py --ranges 8                          # mostly cached reports
+#   python loadtest.py --baseline loadtest_results/baseline.json
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+XLSX_MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1]
+
+
+FIRST_DAY = date(2023, 3, 1)
+SPREAD_DAYS = 600
+
+
+def report_windows(count, days=7, seed=0):
+    # Distinct report date ranges the users cycle through; fewer ranges mean
+    # more report cache hits
+    rnd = random.Random(seed)
+    return [
+        (start, start + timedelta(days=days))
+        for start in (FIRST_DAY + timedelta(days=rnd.randint(0, SPREAD_DAYS)) for _ in range(count))
+    ]
+
+
+class ReportRanges:
+    # Hands out the users' report date ranges: a never-requested one each
+    # time (ranges=0), or one of `ranges` fixed ones. A request for a range
+    # and mode already requested in the run counts as a repeat (served from
+    # the report cache, or joined to the build in flight).
+    def __init__(self, ranges, seed):
+        self.fixed = report_windows(ranges, seed=seed) if ranges else None
+        self._counter = itertools.count()
+        self._requested = set()
+        self._lock = threading.Lock()
+
+    def pick(self, rnd, summary):
+        # -> (start date, end date, repeat)
+        with self._lock:
+            if self.fixed:
+                start, end = rnd.choice(self.fixed)
+            else:
+                index = next(self._counter)
+                start = FIRST_DAY + timedelta(days=index % SPREAD_DAYS)
+                end = start + timedelta(days=7 + index // SPREAD_DAYS)
+            key = (start, end, summary)
+            repeat = key in self._requested
+            self._requested.add(key)
+        return start, end, repeat
+
+
+# --- Server under test
+
+class AppServer:
+    def __init__(self, api_url, workers, threads, workdir):
+        self.port = free_port()
+        self.env = dict(
+            os.environ,
+            PORT=str(self.port),
+            MONDAY_API_URL=api_url,
+            MONDAY_API_KEY="loadtest",
+            MIRROR_DB_PATH=os.path.join(workdir, "mirror.sqlite3"),
+            REPORT_CACHE_DB_PATH=os.path.join(workdir, "report_cache.sqlite3"),
+            REPORT_JOBS_DB_PATH=os.path.join(workdir, "report_cache.sqlite3"),
+            BOARD_SNAPSHOT_DIR=os.path.join(workdir, "board_snapshots"),
+            WEB_CONCURRENCY=str(workers),
+            GUNICORN_THREADS=str(threads),
+            GUNICORN_ACCESS_LOG=os.devnull,
+            SCHEDULER_ENABLED="0",
+            WARMUP_TOKEN="loadtest",
+        )
+        self.log = open(os.path.join(workdir, "gunicorn.log"), "w")
+        self.process = None
+
+    def start(self, timeout=60):
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--bind", f"127.0.0.1:{self.port}"],
+            cwd=ROOT, env=self.env, stdout=self.log, stderr=subprocess.STDOUT,
+        )
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"gunicorn exited with {self.process.returncode}:\n{self.log_tail()}")
+            try:
+                status, _, _ = self.request("GET", "/healthz", timeout=2)
+                if status == 200:
+                    return
+            except OSError:
+                pass
+            time.sleep(0.2)
+        raise RuntimeError(f"gunicorn did not come up in time:\n{self.log_tail()}")
+
+    def log_tail(self, lines=20):
+        # The log lives in the run's temporary directory, so quote it
+        self.log.flush()
+        with open(self.log.name) as log:
+            return "".join(log.readlines()[-lines:])
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        self.log.close()
+
+    def request(self, method, path, body=None, headers=None, timeout=300, conn=None):
+        own = conn is None
+        conn = conn or http.client.HTTPConnection("127.0.0.1", self.port, timeout=timeout)
+        try:
+            conn.request(method, path, body=body, headers=headers or {})
+            response = conn.getresponse()
+            return response.status, response.getheader("Content-Type", ""), response.read()
+        finally:
+            if own:
+                conn.close()
+
+    def worker_pids(self):
+        # Children of the gunicorn master (Linux /proc)
+        pids = []
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry}/stat") as stat:
+                    fields = stat.read().rsplit(")", 1)[1].split()
+            except OSError:
+                continue
+            if int(fields[1]) == self.process.pid:
+                pids.append(int(entry))
+        return pids
+
+
+def rss_bytes(pid):
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+class RssSampler:
+    # Peak RSS per worker while a level runs
+    def __init__(self, server, interval=0.5):
+        self.server = server
+        self.interval = interval
+        self.peaks = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            for pid in self.server.worker_pids():
+                rss = rss_bytes(pid)
+                if rss is not None:
+                    self.peaks[pid] = max(self.peaks.get(pid, 0), rss)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        if os.path.isdir("/proc"):
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+
+# --- Load
+
+def latency_stats(latencies):
+    latencies = sorted(latencies)
+    return {
+        name: None if value is None else round(value, 4)
+        for name, value in (
+            ("p50", percentile(latencies, 50)),
+            ("p95", percentile(latencies, 95)),
+            ("p99", percentile(latencies, 99)),
+            ("max", latencies[-1] if latencies else None),
+        )
+    }
+
+
+def run_level(server, concurrency, duration, ranges, summary_share, seed):
+    results = []   # (latency seconds, ok, repeat)
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def user(index):
+        rnd = random.Random(seed * 1000 + index)
+        conn = http.client.HTTPConnection("127.0.0.1", server.port, timeout=300)
+        while time.monotonic() < deadline:
+            summary = rnd.random() < summary_share
+            start_date, end_date, repeat = ranges.pick(rnd, summary)
+            form = {"start_date": str(start_date), "end_date": str(end_date)}
+            if summary:
+                form["mode"] = "summary"
+            started = time.monotonic()
+            try:
+                status, content_type, _ = server.request(
+                    "POST", "/generate_report", body=urlencode(form),
+                    headers={"Content-Type": "application/x-www-form-urlencoded"}, conn=conn,
+                )
+                # Failed reports come back as 200 text/html; only a workbook counts
+                ok = status == 200 and content_type.startswith(XLSX_MIMETYPE)
+            except (OSError, http.client.HTTPException):
+                ok = False
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", server.port, timeout=300)
+            with lock:
+                results.append((time.monotonic() - started, ok, repeat))
+        conn.close()
+
+    started = time.monotonic()
+    with RssSampler(server) as rss:
+        users = [threading.Thread(target=user, args=(index,)) for index in range(concurrency)]
+        for thread in users:
+            thread.start()
+        for thread in users:
+            thread.join()
+    elapsed = time.monotonic() - started
+
+    latencies = [latency for latency, ok, _ in results if ok]
+    errors = sum(1 for _, ok, _ in results if not ok)
+    peaks = sorted(rss.peaks.values())
+    kinds = {
+        kind: [latency for latency, ok, repeat in results if ok and repeat == (kind == "repeats")]
+        for kind in ("builds", "repeats")
+    }
+    return {
+        "concurrency": concurrency,
+        "requests": len(results),
+        "errors": errors,
+        "error_rate": round(errors / len(results), 4) if results else 0.0,
+        "throughput_rps": round(len(latencies) / elapsed, 3),
+        "latency_seconds": latency_stats(latencies),
+        **{
+            kind: {"requests": len(values), "latency_seconds": latency_stats(values)}
+            for kind, values in kinds.items()
+        },
+        "rss_mib": {
+            "workers": [round(peak / 2**20, 1) for peak in peaks],
+            "max_worker": round(peaks[-1] / 2**20, 1) if peaks else None,
+            "total": round(sum(peaks) / 2**20, 1) if peaks else None,
+        },
+    }
+
+
+def compare(run, baseline, max_regression, max_error_rate):
+    # -> list of failure messages
+    failures = []
+    previous = {level["concurrency"]: level for level in baseline.get("levels", [])}
+    for level in run["levels"]:
+        concurrency = level["concurrency"]
+        if level["error_rate"] > max_error_rate:
+            failures.append(f"{concurrency} users: error rate {level['error_rate']:.2%} over {max_error_rate:.2%}")
+        before = previous.get(concurrency)
+        if not before:
+            continue
+        p95, base_p95 = level["latency_seconds"]["p95"], before["latency_seconds"]["p95"]
+        if p95 is not None and base_p95 and p95 > base_p95 * (1 + max_regression):
+            failures.append(f"{concurrency} users: p95 {p95:.3f}s vs {base_p95:.3f}s in the baseline")
+        # Builds on their own, so cache hits can't hide slower builds
+        p95 = level.get("builds", {}).get("latency_seconds", {}).get("p95")
+        base_p95 = before.get("builds", {}).get("latency_seconds", {}).get("p95")
+        if p95 is not None and base_p95 and p95 > base_p95 * (1 + max_regression):
+            failures.append(f"{concurrency} users: build p95 {p95:.3f}s vs {base_p95:.3f}s in the baseline")
+    return failures
+
+
+def print_level(level):
+    def fmt(value):
+        return "-" if value is None else f"{value:.3f}"
+
+    latency = level["latency_seconds"]
+    builds, repeats = level["builds"], level["repeats"]
+    print(
+        f"{level['concurrency']:>5} users  {level['requests']:>6} req  {level['error_rate']:>7.2%} err  "
+        f"{level['throughput_rps']:>7.2f} req/s  p50 {fmt(latency['p50'])}  p95 {fmt(latency['p95'])}  "
+        f"p99 {fmt(latency['p99'])}  rss/worker {level['rss_mib']['max_worker'] or '-'} MiB\n"
+        f"{'':>12}builds {builds['requests']:>6}  p50 {fmt(builds['latency_seconds']['p50'])}  "
+        f"p95 {fmt(builds['latency_seconds']['p95'])}    repeats {repeats['requests']:>6}  "
+        f"p50 {fmt(repeats['latency_seconds']['p50'])}  p95 {fmt(repeats['latency_seconds']['p95'])}"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test /generate_report under gunicorn")
+    parser.add_argument("--concurrency", default="1,2,4,8", help="comma-separated concurrent users per level")
+    parser.add_argument("--duration", type=float, default=20, help="seconds per concurrency level")
+    parser.add_argument("--items", type=int, default=2000, help="items per mock board")
+    parser.add_argument("--latency", type=float, default=0.05, help="mock API seconds per response")
+    parser.add_argument("--item-latency", type=float, default=0.0, help="mock API seconds per item returned")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", 2)))
+    parser.add_argument("--threads", type=int, default=int(os.environ.get("GUNICORN_THREADS", 4)))
+    parser.add_argument("--ranges", type=int, default=0,
+                        help="distinct report date ranges to cycle (0: a new range per request, no cache hits)")
+    parser.add_argument("--summary-share", type=float, default=0.0, help="share of mode=summary requests")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="results file (default loadtest_results/<UTC time>.json)")
+    parser.add_argument("--baseline", help="earlier results to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="allowed p95 increase over the baseline")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    args = parser.parse_args(argv)
+
+    levels = [int(value) for value in args.concurrency.split(",") if value.strip()]
+    ranges = ReportRanges(args.ranges, args.seed)
+    run = {
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "params": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "levels": [],
+    }
+
+    mock, api_url = mock_monday.start_server(items=args.items, latency=args.latency, item_latency=args.item_latency)
+    with tempfile.TemporaryDirectory(prefix="loadtest-") as workdir:
+        server = AppServer(api_url, args.workers, args.threads, workdir)
+        try:
+            server.start()
+            # Seeds the mirror from the mock API before anything is measured
+            started = time.monotonic()
+            status, _, body = server.request("POST", "/warmup", headers={"Authorization": "Bearer loadtest"})
+            if status != 200:
+                raise RuntimeError(f"warm-up failed: {body[:500]!r}")
+            run["warmup_seconds"] = round(time.monotonic() - started, 3)
+            print(f"warm-up {run['warmup_seconds']:.2f}s, {mock.api.requests} mock API requests")
+
+            for concurrency in levels:
+                level = run_level(server, concurrency, args.duration, ranges, args.summary_share, args.seed)
+                run["levels"].append(level)
+                print_level(level)
+        finally:
+            server.stop()
+            mock.shutdown()
+
+    output = args.output or os.path.join(
+        ROOT, "loadtest_results", datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ") + ".json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(run, file, indent=2)
+    print(f"results saved to {output}")
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            failures = compare(run, json.load(file), args.max_regression, args.max_error_rate)
+    else:
+        failures = compare(run, {}, args.max_regression, args.max_error_rate)
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+import heapq
+import logging
+import os
+import random
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import admission
+from mirror import get_mirror
+from report_config import get_config
+
+# Opt-in memory profiling of report builds. A profiled build records, per
+# pipeline stage (sync, load, flags, aggregate, data_sheet, summary_sheet,
+# detail_sections, save), the traced heap peak and the memory the stage left
+# behind, plus the source lines that grew the most. sync.py marks the stage
+# boundaries with stage(), which does nothing unless the current thread is
+# being profiled.
+#
+# tracemalloc is process-wide: while a profile runs, allocations made by
+# other threads are counted too, and only one profile runs at a time (a
+# request sampled while another is being profiled just isn't profiled).
+# Tracing every allocation makes a profiled build several times slower (the
+# openpyxl stages allocate per cell), and the top sites add one snapshot per
+# stage, so production traffic is only sampled:
+# REPORT_MEMORY_PROFILE_RATE=0.01 profiles one report in a hundred.
+
+logger = logging.getLogger(__name__)
+
+PROFILE_RATE = float(os.environ.get("REPORT_MEMORY_PROFILE_RATE", 0))
+# Allocation sites listed per stage; 0 skips the snapshots altogether
+PROFILE_TOP_SITES = int(os.environ.get("REPORT_MEMORY_PROFILE_TOP_SITES", 10))
+PROFILE_FRAMES = int(os.environ.get("REPORT_MEMORY_PROFILE_FRAMES", 1))
+
+_local = threading.local()
+_running = threading.Lock()
+
+_IGNORED_FILES = {tracemalloc.__file__, __file__}
+
+
+def sampled(requested=False):
+    return requested or (PROFILE_RATE > 0 and random.random() < PROFILE_RATE)
+
+
+class MemoryProfile:
+    def __init__(self, top_sites=PROFILE_TOP_SITES):
+        self.top_sites = top_sites
+        self.stages = []
+        self.current = None
+        self.started = time.monotonic()
+        self.baseline = tracemalloc.get_traced_memory()[0]
+        self.sizes = self._sizes()
+
+    def _sizes(self):
+        # source line -> (bytes, blocks) allocated there and still alive
+        if not self.top_sites:
+            return None
+        return {
+            stat.traceback: (stat.size, stat.count)
+            for stat in tracemalloc.take_snapshot().statistics("lineno")
+            if stat.traceback[0].filename not in _IGNORED_FILES
+        }
+
+    def begin(self, name):
+        self.end()
+        tracemalloc.reset_peak()
+        self.current = (name, time.monotonic(), tracemalloc.get_traced_memory()[0])
+
+    def end(self):
+        if self.current is None:
+            return
+        name, started, before = self.current
+        self.current = None
+        after, peak = tracemalloc.get_traced_memory()
+        stage = {
+            "stage": name,
+            "seconds": round(time.monotonic() - started, 3),
+            "peak_bytes": peak - self.baseline,
+            "retained_bytes": after - before,
+        }
+        sizes = self._sizes()
+        if sizes is not None:
+            # The lines whose live allocations grew the most over the stage
+            growth = (
+                (size - self.sizes.get(site, (0, 0))[0], count - self.sizes.get(site, (0, 0))[1], site)
+                for site, (size, count) in sizes.items()
+            )
+            stage["top_sites"] = [
+                {"site": str(site), "size_bytes": size, "count": count}
+                for size, count, site in heapq.nlargest(self.top_sites, growth, key=lambda entry: entry[0])
+                if size > 0
+            ]
+            self.sizes = sizes
+        self.stages.append(stage)
+
+    def to_dict(self):
+        return {
+            "seconds": round(time.monotonic() - self.started, 3),
+            "peak_bytes": max((stage["peak_bytes"] for stage in self.stages), default=0),
+            "stages": self.stages,
+        }
+
+
+@contextmanager
+def profiling():
+    # Yields the MemoryProfile for this thread's build, or None when another
+    # profile is already running
+    if not _running.acquire(blocking=False):
+        yield None
+        return
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start(PROFILE_FRAMES)
+    profile = _local.profile = MemoryProfile()
+    try:
+        yield profile
+    finally:
+        profile.end()
+        _local.profile = None
+        profile.sizes = None
+        if not tracing:
+            tracemalloc.stop()
+        _running.release()
+
+
+def stage(name):
+    # Starts stage `name` (ending the previous one) if this thread is profiled
+    profile = getattr(_local, "profile", None)
+    if profile is not None:
+        profile.begin(name)
+
+
+def log_profile(result, label):
+    logger.info(
+        "Memory profile %s: peak %.1f MiB over %.2fs; %s",
+        label, result["peak_bytes"] / 2**20, result["seconds"],
+        ", ".join(
+            f"{stage['stage']} peak {stage['peak_bytes'] / 2**20:.1f} MiB / kept {stage['retained_bytes'] / 2**20:+.1f} MiB"
+            for stage in result["stages"]
+        ),
+    )
+
+
+def profile_report(start_date, end_date, board_ids=None, detail=True, as_of=None):
+    # Builds the report from scratch (no report / model cache, so every stage
+    # runs) under the profiler. Returns (workbook bytes, profile dict or None)
+    from sync import generate_report
+
+    config = get_config()
+    cost = admission.estimate_report_cost(config.resolve_boards(board_ids), get_mirror(), config, detail)
+    with admission.get_admission_controller().admit(cost), profiling() as profile:
+        data = generate_report(start_date, end_date, board_ids, detail=detail, as_of=as_of).getvalue()
+    if profile is None:
+        return data, None
+    result = profile.to_dict()
+    log_profile(result, f"{start_date}..{end_date}")
+    return data, result
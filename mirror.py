@@ -0,0 +1,916 @@
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import monday_client
+from report_config import get_config
+
+# Local mirror of the monday.com boards, kept current by webhook events
+# (/webhooks/monday) with a periodic full crawl as a safety net. Reports read
+# from here, so they never wait on the monday.com API once a board is seeded.
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = os.environ.get(
+    "MIRROR_DB_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "monday_mirror.sqlite3"),
+)
+RECONCILE_SECONDS = int(os.environ.get("MIRROR_RECONCILE_SECONDS", 900))
+STALE_REFRESH_SECONDS = int(os.environ.get("MIRROR_STALE_REFRESH_SECONDS", 30))
+SIGNING_SECRET = os.environ.get("MONDAY_SIGNING_SECRET")
+# Webhook events rewrite the mirror every report reads from, so without a
+# signing secret they are refused. MONDAY_ALLOW_UNSIGNED_WEBHOOKS=1 accepts
+# them unsigned, for local development only.
+ALLOW_UNSIGNED_WEBHOOKS = os.environ.get("MONDAY_ALLOW_UNSIGNED_WEBHOOKS") == "1"
+# A full board checkpoint is written after this many history entries, so an
+# as-of read never replays more than that on top of a checkpoint
+HISTORY_CHECKPOINT_EVERY = int(os.environ.get("MIRROR_HISTORY_CHECKPOINT_EVERY", 1000))
+# History older than this is compacted into the checkpoint it leads up to,
+# so as-of reports reach back about this far (0 keeps everything)
+HISTORY_RETENTION_DAYS = float(os.environ.get("MIRROR_HISTORY_RETENTION_DAYS", 365))
+# A crawl that fails mid-board is resumed from its last checkpointed page up
+# to this many times before the reconcile gives up; the next reconcile then
+# resumes it again, as long as the cursor hasn't expired (monday.com keeps
+# items_page cursors for 60 minutes)
+CRAWL_RETRIES = int(os.environ.get("MIRROR_CRAWL_RETRIES", 3))
+CRAWL_RETRY_SECONDS = float(os.environ.get("MIRROR_CRAWL_RETRY_SECONDS", 2))
+CRAWL_CURSOR_TTL_SECONDS = int(os.environ.get("MIRROR_CRAWL_CURSOR_TTL_SECONDS", 3000))
+# Only one crawl per board runs at a time, across gunicorn workers too: the
+# crawler holds a lease on the board, renewed with every page. A lease that
+# ran out (its worker died mid-crawl) is taken over, crawl checkpoint and all.
+CRAWL_LEASE_SECONDS = float(os.environ.get("MIRROR_CRAWL_LEASE_SECONDS", 300))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS boards (
+    board_id INTEGER PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0,
+    synced_at REAL
+);
+CREATE TABLE IF NOT EXISTS items (
+    board_id INTEGER NOT NULL,
+    item_id TEXT NOT NULL,
+    name TEXT,
+    column_values TEXT NOT NULL DEFAULT '{}',
+    position INTEGER NOT NULL,
+    version INTEGER NOT NULL,
+    stale INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (board_id, item_id)
+);
+CREATE INDEX IF NOT EXISTS items_by_version ON items (board_id, version);
+CREATE TABLE IF NOT EXISTS deleted_items (
+    board_id INTEGER NOT NULL,
+    item_id TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    PRIMARY KEY (board_id, item_id)
+);
+CREATE TABLE IF NOT EXISTS board_columns (
+    board_id INTEGER NOT NULL,
+    column_id TEXT NOT NULL,
+    title TEXT NOT NULL,
+    PRIMARY KEY (board_id, column_id)
+);
+CREATE TABLE IF NOT EXISTS item_history (
+    board_id INTEGER NOT NULL,
+    version INTEGER NOT NULL,
+    item_id TEXT NOT NULL,
+    recorded_at REAL NOT NULL,
+    op TEXT NOT NULL,
+    delta TEXT
+);
+CREATE INDEX IF NOT EXISTS item_history_by_version ON item_history (board_id, version);
+CREATE TABLE IF NOT EXISTS history_checkpoints (
+    board_id INTEGER NOT NULL,
+    version INTEGER NOT NULL,
+    recorded_at REAL NOT NULL,
+    state BLOB NOT NULL,
+    PRIMARY KEY (board_id, version)
+);
+CREATE TABLE IF NOT EXISTS crawl_checkpoints (
+    board_id INTEGER PRIMARY KEY,
+    cursor TEXT,
+    position INTEGER NOT NULL,
+    started_version INTEGER NOT NULL,
+    started_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS crawl_seen (
+    board_id INTEGER NOT NULL,
+    item_id TEXT NOT NULL,
+    PRIMARY KEY (board_id, item_id)
+);
+CREATE TABLE IF NOT EXISTS board_moves (
+    board_id INTEGER PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS crawl_leases (
+    board_id INTEGER PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+# Per-connection capture of the item rows a board transaction touches: the
+# first OLD state of each item lands in history_pending, and the transaction
+# turns old vs. current into an item_history delta before it commits.
+HISTORY_CAPTURE = """
+CREATE TEMP TABLE IF NOT EXISTS history_pending (
+    board_id INTEGER NOT NULL,
+    item_id TEXT NOT NULL,
+    existed INTEGER NOT NULL,
+    name TEXT,
+    column_values TEXT,
+    position INTEGER,
+    stale INTEGER,
+    PRIMARY KEY (board_id, item_id)
+);
+CREATE TEMP TRIGGER IF NOT EXISTS history_items_insert AFTER INSERT ON main.items BEGIN
+    INSERT OR IGNORE INTO history_pending VALUES (NEW.board_id, NEW.item_id, 0, NULL, NULL, NULL, NULL);
+END;
+CREATE TEMP TRIGGER IF NOT EXISTS history_items_update AFTER UPDATE ON main.items BEGIN
+    INSERT OR IGNORE INTO history_pending
+    VALUES (OLD.board_id, OLD.item_id, 1, OLD.name, OLD.column_values, OLD.position, OLD.stale);
+END;
+CREATE TEMP TRIGGER IF NOT EXISTS history_items_delete AFTER DELETE ON main.items BEGIN
+    INSERT OR IGNORE INTO history_pending
+    VALUES (OLD.board_id, OLD.item_id, 1, OLD.name, OLD.column_values, OLD.position, OLD.stale);
+END;
+"""
+
+CREATE_EVENTS = {"create_pulse", "create_item"}
+DELETE_EVENTS = {"delete_pulse", "item_deleted", "archive_pulse", "item_archived"}
+NAME_EVENTS = {"update_name", "change_name"}
+COLUMN_EVENTS = {
+    "update_column_value", "change_column_value",
+    "change_status_column_value", "change_specific_column_value",
+}
+
+# Marker for column values whose display text can't be derived from the event
+# (people, formulas, ...). The item is flagged stale and re-fetched instead.
+UNKNOWN = object()
+
+
+def event_text(value):
+    if value is None:
+        return ""
+    if not isinstance(value, dict):
+        return str(value)
+    if "label" in value:
+        label = value["label"]
+        return label.get("text") or "" if isinstance(label, dict) else str(label)
+    if "date" in value:
+        if value.get("time"):
+            return f"{value['date']} {value['time'][:5]}"
+        return value["date"] or ""
+    if "countryName" in value:
+        return value["countryName"] or ""
+    if "chosenValues" in value:
+        return ", ".join(v.get("name", "") for v in value["chosenValues"] or [])
+    if isinstance(value.get("value"), (str, int, float)):
+        return str(value["value"])
+    if isinstance(value.get("text"), str):
+        return value["text"]
+    return UNKNOWN
+
+
+# --- History encoding
+#
+# item_history holds one row per item change: op "put" with a delta against
+# the item's previous state ({"n": name, "v": {title: text}, "x": [removed
+# titles]}, only the parts that changed) or op "delete". Positions shift for
+# every item below an added or removed one, so a delta only carries one
+# ("p") when the item is new or was a placeholder whose position was a
+# guess; a past board is ordered by the positions items had then or at the
+# last checkpoint. Checkpoints are the whole board, {item_id: [name,
+# position, values]}, as zlib-compressed JSON.
+
+def item_delta(old, new):
+    old_name, old_position, old_values = old or (None, None, {})
+    name, position, values = new
+    delta = {}
+    if name != old_name:
+        delta["n"] = name
+    if old_position is None:
+        delta["p"] = position
+    changed = {title: text for title, text in values.items() if title not in old_values or old_values[title] != text}
+    if changed:
+        delta["v"] = changed
+    removed = [title for title in old_values if title not in values]
+    if removed:
+        delta["x"] = removed
+    return delta
+
+
+def apply_history(state, item_id, op, delta):
+    if op == "delete":
+        state.pop(item_id, None)
+        return
+    name, position, values = state.get(item_id) or (None, None, {})
+    values = {**values, **delta.get("v", {})}
+    for title in delta.get("x", ()):
+        values.pop(title, None)
+    state[item_id] = [delta.get("n", name), delta.get("p", position), values]
+
+
+def encode_state(state):
+    return zlib.compress(json.dumps(state, ensure_ascii=False, separators=(",", ":")).encode())
+
+
+def decode_state(blob):
+    return json.loads(zlib.decompress(blob))
+
+
+def _event_id(event, *keys):
+    value = next((event[key] for key in keys if event.get(key) is not None), None)
+    if isinstance(value, bool) or not isinstance(value, (int, str)) or not str(value).strip().isdigit():
+        raise ValueError(f"Webhook event needs an integer {keys[0]}, got {value!r}.")
+    return int(value)
+
+
+def event_ids(event):
+    # (board ID, item ID) of a webhook event; ValueError for anything that
+    # isn't an event about one item of one board
+    if not isinstance(event, dict):
+        raise ValueError("Webhook event must be a JSON object.")
+    return _event_id(event, "boardId"), str(_event_id(event, "pulseId", "itemId"))
+
+
+# --- Webhook signature (monday.com signs requests as an HS256 JWT)
+
+def _b64url(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64url_decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def make_webhook_token(secret, claims=None):
+    header = _b64url(json.dumps({"alg": "HS256", "typ": "JWT"}).encode())
+    payload = _b64url(json.dumps(claims or {"iat": int(time.time())}).encode())
+    signature = hmac.new(secret.encode(), f"{header}.{payload}".encode(), hashlib.sha256).digest()
+    return f"{header}.{payload}.{_b64url(signature)}"
+
+
+def verify_webhook(authorization, secret=None):
+    secret = secret or SIGNING_SECRET
+    if not secret:
+        return ALLOW_UNSIGNED_WEBHOOKS
+    if not authorization:
+        return False
+
+    token = authorization.split(" ", 1)[-1].strip()
+    try:
+        header, payload, signature = token.split(".")
+        expected = hmac.new(secret.encode(), f"{header}.{payload}".encode(), hashlib.sha256).digest()
+        if not hmac.compare_digest(expected, _b64url_decode(signature)):
+            return False
+        claims = json.loads(_b64url_decode(payload))
+    except ValueError:
+        return False
+    return not claims.get("exp") or claims["exp"] >= time.time()
+
+
+def check_webhook_settings():
+    # Called once at startup, so a missing secret shows up in the logs
+    if SIGNING_SECRET:
+        return
+    if ALLOW_UNSIGNED_WEBHOOKS:
+        logger.warning("MONDAY_ALLOW_UNSIGNED_WEBHOOKS is set: webhook events are accepted without a signature")
+    else:
+        logger.warning("MONDAY_SIGNING_SECRET is not set: monday.com webhook events will be rejected")
+
+
+# --- Board mirror
+
+class CrawlLeaseLost(Exception):
+    # Another crawler took the board over after this one's lease ran out
+    pass
+
+
+class BoardMirror:
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._crawl_locks = {}
+        self._crawl_locks_lock = threading.Lock()
+        self._connect()
+        self._bootstrap_history()
+
+    def _connect(self):
+        # One connection per thread; WAL lets readers run while a webhook writes
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA + HISTORY_CAPTURE)
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    @contextmanager
+    def _board_transaction(self, board_id):
+        # Every write transaction gets the board's next version number; the
+        # board version only moves if the transaction actually changed rows.
+        with self._transaction() as conn:
+            conn.execute("INSERT INTO boards (board_id) VALUES (?) ON CONFLICT(board_id) DO NOTHING", (board_id,))
+            (version,) = conn.execute("SELECT version FROM boards WHERE board_id = ?", (board_id,)).fetchone()
+            changes_before = conn.total_changes
+            yield conn, version + 1
+            if conn.total_changes > changes_before:
+                conn.execute("UPDATE boards SET version = ? WHERE board_id = ?", (version + 1, board_id))
+                self._record_history(conn, board_id, version + 1)
+
+    # --- Reads
+
+    def version(self, board_id):
+        row = self._connect().execute("SELECT version FROM boards WHERE board_id = ?", (board_id,)).fetchone()
+        return row[0] if row else 0
+
+    def synced_at(self, board_id):
+        row = self._connect().execute("SELECT synced_at FROM boards WHERE board_id = ?", (board_id,)).fetchone()
+        return row[0] if row else None
+
+    def iter_items(self, board_id, since_version=None):
+        # (item_id, name, {title: text}, position) in board order; with
+        # since_version, only the items written after that board version
+        query = "SELECT item_id, name, column_values, position FROM items WHERE board_id = ?"
+        params = (board_id,)
+        if since_version is not None:
+            query += " AND version > ?"
+            params += (since_version,)
+        cursor = self._connect().execute(query + " ORDER BY position", params)
+        for item_id, name, values, position in cursor:
+            yield item_id, name, monday_client.loads(values), position
+
+    def item_positions(self, board_id):
+        # [(item_id, position)] for the whole board; positions move without
+        # a new item version, so incremental readers re-read them when
+        # moves_version says items moved
+        return self._connect().execute(
+            "SELECT item_id, position FROM items WHERE board_id = ?", (board_id,)
+        ).fetchall()
+
+    def moves_version(self, board_id):
+        # Board version of the last write that moved existing items (0: none)
+        row = self._connect().execute("SELECT version FROM board_moves WHERE board_id = ?", (board_id,)).fetchone()
+        return row[0] if row else 0
+
+    def deleted_since(self, board_id, since_version):
+        rows = self._connect().execute(
+            "SELECT item_id FROM deleted_items WHERE board_id = ? AND version > ?", (board_id, since_version)
+        ).fetchall()
+        return [item_id for (item_id,) in rows]
+
+    # --- History (point-in-time reads)
+
+    def _record_history(self, conn, board_id, version):
+        now = time.time()
+        pending = conn.execute(
+            """
+            SELECT p.item_id, p.existed, p.name, p.column_values, CASE WHEN p.stale THEN NULL ELSE p.position END,
+                   i.item_id IS NOT NULL, i.name, i.column_values, i.position,
+                   p.existed AND i.position != p.position
+            FROM history_pending p
+            LEFT JOIN items i ON i.board_id = p.board_id AND i.item_id = p.item_id
+            WHERE p.board_id = ?
+            """,
+            (board_id,),
+        ).fetchall()
+        entries = []
+        moved = False
+        for item_id, existed, old_name, old_values, old_position, exists, name, values, position, item_moved in pending:
+            moved = moved or bool(item_moved)
+            old = (old_name, old_position, json.loads(old_values)) if existed else None
+            if not exists:
+                if old is not None:
+                    entries.append((board_id, version, item_id, now, "delete", None))
+                continue
+            # Only name and values are history; the stale flag and moves aren't
+            delta = item_delta(old, (name, position, json.loads(values)))
+            if delta:
+                entries.append((board_id, version, item_id, now, "put", json.dumps(delta, ensure_ascii=False)))
+        conn.execute("DELETE FROM history_pending")
+        if moved:
+            conn.execute(
+                "INSERT INTO board_moves (board_id, version) VALUES (?, ?)"
+                " ON CONFLICT(board_id) DO UPDATE SET version = excluded.version",
+                (board_id, version),
+            )
+        if not entries:
+            return
+
+        conn.executemany(
+            "INSERT INTO item_history (board_id, version, item_id, recorded_at, op, delta) VALUES (?, ?, ?, ?, ?, ?)",
+            entries,
+        )
+        (since_checkpoint,) = conn.execute(
+            """
+            SELECT COUNT(*) FROM item_history WHERE board_id = ? AND version >
+                (SELECT COALESCE(MAX(version), 0) FROM history_checkpoints WHERE board_id = ?)
+            """,
+            (board_id, board_id),
+        ).fetchone()
+        if since_checkpoint >= HISTORY_CHECKPOINT_EVERY:
+            self._write_checkpoint(conn, board_id, version, now)
+
+    def _write_checkpoint(self, conn, board_id, version, recorded_at):
+        state = {
+            item_id: [name, position, json.loads(values)]
+            for item_id, name, values, position in conn.execute(
+                "SELECT item_id, name, column_values, position FROM items WHERE board_id = ?", (board_id,)
+            )
+        }
+        conn.execute(
+            "INSERT OR REPLACE INTO history_checkpoints (board_id, version, recorded_at, state) VALUES (?, ?, ?, ?)",
+            (board_id, version, recorded_at, encode_state(state)),
+        )
+
+    def _bootstrap_history(self):
+        # Mirrors created before the history existed start it from a
+        # checkpoint of their current contents
+        conn = self._connect()
+        boards = conn.execute(
+            """
+            SELECT board_id, version FROM boards b
+            WHERE NOT EXISTS (SELECT 1 FROM history_checkpoints c WHERE c.board_id = b.board_id)
+              AND NOT EXISTS (SELECT 1 FROM item_history h WHERE h.board_id = b.board_id)
+              AND EXISTS (SELECT 1 FROM items i WHERE i.board_id = b.board_id)
+            """
+        ).fetchall()
+        for board_id, version in boards:
+            with conn:
+                self._write_checkpoint(conn, board_id, version, time.time())
+
+    def compact_history(self, board_id, retention_days=HISTORY_RETENTION_DAYS):
+        # Drops the checkpoints and history entries that only serve as-of
+        # reads from before the retention window: the latest checkpoint older
+        # than the cutoff already holds their combined state
+        if retention_days <= 0:
+            return 0
+        cutoff = time.time() - retention_days * 86400
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT MAX(version) FROM history_checkpoints WHERE board_id = ? AND recorded_at <= ?",
+                (board_id, cutoff),
+            ).fetchone()
+            if row[0] is None:
+                return 0
+            removed = conn.execute(
+                "DELETE FROM item_history WHERE board_id = ? AND version <= ?", (board_id, row[0])
+            ).rowcount
+            removed += conn.execute(
+                "DELETE FROM history_checkpoints WHERE board_id = ? AND version < ?", (board_id, row[0])
+            ).rowcount
+        if removed:
+            logger.info("Compacted %d history rows of board %s", removed, board_id)
+        return removed
+
+    def history_start(self, board_id):
+        row = self._connect().execute(
+            """
+            SELECT MIN(recorded_at) FROM (
+                SELECT MIN(recorded_at) AS recorded_at FROM history_checkpoints WHERE board_id = ?
+                UNION ALL
+                SELECT MIN(recorded_at) FROM item_history WHERE board_id = ?
+            )
+            """,
+            (board_id, board_id),
+        ).fetchone()
+        return row[0] if row else None
+
+    def iter_items_as_of(self, board_id, as_of):
+        # Same rows as iter_items, for the board as it was at the epoch
+        # timestamp as_of: the latest checkpoint before it plus the history
+        # recorded after that checkpoint, up to as_of
+        started = self.history_start(board_id)
+        if started is None or as_of < started:
+            raise ValueError(f"No history for board {board_id} before {time.ctime(as_of)}.")
+
+        conn = self._connect()
+        checkpoint = conn.execute(
+            """
+            SELECT version, state FROM history_checkpoints
+            WHERE board_id = ? AND recorded_at <= ? ORDER BY version DESC LIMIT 1
+            """,
+            (board_id, as_of),
+        ).fetchone()
+        state, since_version = (decode_state(checkpoint[1]), checkpoint[0]) if checkpoint else ({}, 0)
+
+        rows = conn.execute(
+            """
+            SELECT item_id, op, delta FROM item_history
+            WHERE board_id = ? AND version > ? AND recorded_at <= ? ORDER BY version, rowid
+            """,
+            (board_id, since_version, as_of),
+        )
+        for item_id, op, delta in rows:
+            apply_history(state, item_id, op, json.loads(delta) if delta else None)
+
+        for item_id, (name, position, values) in sorted(state.items(), key=lambda item: item[1][1]):
+            yield item_id, name, values, position
+
+    def column_title(self, board_id, column_id):
+        row = self._connect().execute(
+            "SELECT title FROM board_columns WHERE board_id = ? AND column_id = ?", (board_id, column_id)
+        ).fetchone()
+        return row[0] if row else None
+
+    # --- Row helpers (called inside a board transaction)
+
+    def _upsert(self, conn, board_id, item_id, name, values, version, position=None):
+        conn.execute(
+            """
+            INSERT INTO items (board_id, item_id, name, column_values, position, version, stale)
+            VALUES (?, ?, ?, ?, COALESCE(?, (SELECT COALESCE(MAX(position), 0) + 1 FROM items WHERE board_id = ?)), ?, 0)
+            ON CONFLICT (board_id, item_id) DO UPDATE SET
+                name = excluded.name,
+                column_values = excluded.column_values,
+                position = excluded.position,
+                -- An item that only moved (every item below a deleted one
+                -- moves up) keeps its version, so it doesn't count as changed
+                version = CASE
+                    WHEN items.name IS NOT excluded.name OR items.column_values != excluded.column_values OR items.stale
+                    THEN excluded.version ELSE items.version
+                END,
+                stale = 0
+            WHERE items.name IS NOT excluded.name
+               OR items.column_values != excluded.column_values
+               OR items.position != excluded.position
+               OR items.stale
+            """,
+            (board_id, item_id, name, json.dumps(values, ensure_ascii=False), position, board_id, version),
+        )
+        conn.execute("DELETE FROM deleted_items WHERE board_id = ? AND item_id = ?", (board_id, item_id))
+
+    def _delete(self, conn, board_id, item_id, version):
+        deleted = conn.execute("DELETE FROM items WHERE board_id = ? AND item_id = ?", (board_id, item_id)).rowcount
+        if deleted:
+            conn.execute(
+                "INSERT OR REPLACE INTO deleted_items (board_id, item_id, version) VALUES (?, ?, ?)",
+                (board_id, item_id, version),
+            )
+
+    def _ensure_item(self, conn, board_id, item_id, name, version):
+        # Placeholder for an item we only know from an event; the stale flag
+        # gets its full column values fetched on the next refresh.
+        conn.execute(
+            """
+            INSERT INTO items (board_id, item_id, name, column_values, position, version, stale)
+            VALUES (?, ?, ?, '{}', (SELECT COALESCE(MAX(position), 0) + 1 FROM items WHERE board_id = ?), ?, 1)
+            ON CONFLICT (board_id, item_id) DO NOTHING
+            """,
+            (board_id, item_id, name, board_id, version),
+        )
+
+    def _mark_stale(self, conn, board_id, item_id):
+        conn.execute("UPDATE items SET stale = 1 WHERE board_id = ? AND item_id = ?", (board_id, item_id))
+
+    # --- Webhook events
+
+    def apply_event(self, event):
+        event_type = event.get("type")
+        board_id, item_id = event_ids(event)
+
+        with self._board_transaction(board_id) as (conn, version):
+            if event_type in DELETE_EVENTS:
+                self._delete(conn, board_id, item_id, version)
+
+            elif event_type in CREATE_EVENTS:
+                self._ensure_item(conn, board_id, item_id, event.get("pulseName"), version)
+
+            elif event_type in NAME_EVENTS:
+                value = event.get("value") or {}
+                name = value.get("name") if isinstance(value, dict) else value
+                self._ensure_item(conn, board_id, item_id, name, version)
+                conn.execute(
+                    "UPDATE items SET name = ?, version = ? WHERE board_id = ? AND item_id = ? AND name IS NOT ?",
+                    (name, version, board_id, item_id, name),
+                )
+
+            elif event_type in COLUMN_EVENTS:
+                self._ensure_item(conn, board_id, item_id, event.get("pulseName"), version)
+                title = event.get("columnTitle") or self.column_title(board_id, event.get("columnId"))
+                text = event_text(event.get("value"))
+                if title is None or text is UNKNOWN:
+                    self._mark_stale(conn, board_id, item_id)
+                    return
+
+                (values,) = conn.execute(
+                    "SELECT column_values FROM items WHERE board_id = ? AND item_id = ?", (board_id, item_id)
+                ).fetchone()
+                values = json.loads(values)
+                if values.get(title) != text:
+                    values[title] = text
+                    conn.execute(
+                        "UPDATE items SET column_values = ?, version = ? WHERE board_id = ? AND item_id = ?",
+                        (json.dumps(values, ensure_ascii=False), version, board_id, item_id),
+                    )
+
+            else:
+                logger.info("Ignoring monday.com event type %s", event_type)
+
+    # --- Sync from the API
+
+    def refresh_stale(self, api_key, limit=500):
+        stale = self._connect().execute(
+            "SELECT board_id, item_id FROM items WHERE stale = 1 LIMIT ?", (limit,)
+        ).fetchall()
+        if not stale:
+            return 0
+
+        fetched = monday_client.fetch_items_by_id([item_id for _, item_id in stale], api_key)
+        if fetched is None:
+            return 0
+        fetched = {str(item["id"]): item for item in fetched}
+
+        for board_id, item_id in stale:
+            item = fetched.get(item_id)
+            with self._board_transaction(board_id) as (conn, version):
+                if item is None or int(item["board"]["id"]) != board_id:
+                    self._delete(conn, board_id, item_id, version)
+                else:
+                    position = conn.execute(
+                        "SELECT position FROM items WHERE board_id = ? AND item_id = ?", (board_id, item_id)
+                    ).fetchone()
+                    self._upsert(conn, board_id, item_id, item["name"], monday_client.item_values(item),
+                                 version, position[0] if position else None)
+        return len(stale)
+
+    def reconcile_board(self, board_id, api_key):
+        # Full crawl, one short transaction per page so webhook writes aren't
+        # blocked for the length of the crawl. The cursor is checkpointed
+        # after every page, so a failure resumes from the last good page
+        # rather than from page one, and the board only counts as synced once
+        # every page is in. Items that disappeared from the board (and weren't
+        # touched by an event meanwhile) are pruned at the end.
+        #
+        # The checkpoint belongs to the board, so crawls of the same board
+        # take turns (a thread lock, and a lease for other processes); a
+        # crawl that finished while this one waited stands in for it.
+        synced_at = self.synced_at(board_id)
+        owner = uuid.uuid4().hex
+        with self._crawl_lock(board_id):
+            while True:
+                while not self._take_lease(board_id, owner):
+                    time.sleep(CRAWL_RETRY_SECONDS)
+                try:
+                    if self.synced_at(board_id) != synced_at:
+                        logger.info("Board %s was crawled meanwhile, not crawling it again", board_id)
+                        return self.item_count(board_id)
+                    return self._reconcile(board_id, api_key, owner)
+                except CrawlLeaseLost:
+                    logger.warning("Crawl of board %s was taken over by another worker", board_id)
+                finally:
+                    self._release_lease(board_id, owner)
+
+    @contextmanager
+    def _crawl_lock(self, board_id):
+        with self._crawl_locks_lock:
+            lock = self._crawl_locks.setdefault(board_id, threading.Lock())
+        with lock:
+            yield
+
+    def _take_lease(self, board_id, owner):
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT owner, expires_at FROM crawl_leases WHERE board_id = ?", (board_id,)
+            ).fetchone()
+            if row is not None and row[0] != owner and row[1] > now:
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO crawl_leases (board_id, owner, expires_at) VALUES (?, ?, ?)",
+                (board_id, owner, now + CRAWL_LEASE_SECONDS),
+            )
+            return True
+
+    def _hold_lease(self, conn, board_id, owner, renew=False):
+        # Raises CrawlLeaseLost (rolling back conn's transaction) unless the
+        # lease is still this crawler's
+        if renew:
+            held = conn.execute(
+                "UPDATE crawl_leases SET expires_at = ? WHERE board_id = ? AND owner = ?",
+                (time.time() + CRAWL_LEASE_SECONDS, board_id, owner),
+            ).rowcount
+        else:
+            held = conn.execute(
+                "SELECT 1 FROM crawl_leases WHERE board_id = ? AND owner = ?", (board_id, owner)
+            ).fetchone()
+        if not held:
+            raise CrawlLeaseLost(board_id)
+
+    def _release_lease(self, board_id, owner):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM crawl_leases WHERE board_id = ? AND owner = ?", (board_id, owner))
+
+    def _reconcile(self, board_id, api_key, owner):
+        self.sync_columns(board_id, api_key)
+
+        failures = 0
+        while True:
+            checkpoint = self._crawl_checkpoint(board_id)
+            try:
+                count = self._crawl(board_id, api_key, checkpoint, owner)
+                break
+            except monday_client.CursorExpiredError:
+                logger.warning("Cursor for board %s expired, crawling it again from the start", board_id)
+                self._clear_checkpoint(board_id)
+                failures += 1
+                if failures > CRAWL_RETRIES:
+                    raise
+            except (monday_client.MondayAPIError, OSError):  # requests' errors are OSErrors
+                failures += 1
+                if failures > CRAWL_RETRIES:
+                    raise
+                logger.warning("Crawl of board %s failed, resuming from the last page", board_id, exc_info=True)
+                time.sleep(CRAWL_RETRY_SECONDS * failures)
+
+        logger.info("Reconciled board %s: %d items", board_id, count)
+        return count
+
+    def _crawl(self, board_id, api_key, checkpoint, owner):
+        cursor, position, started_version, started_at = checkpoint
+
+        # No cursor after the first page means every page is already in
+        if cursor or not position:
+            for page, cursor in monday_client.iter_board_pages(board_id, api_key, cursor):
+                with self._board_transaction(board_id) as (conn, version):
+                    self._hold_lease(conn, board_id, owner)
+                    for item_id, name, values in page:
+                        position += 1
+                        self._upsert(conn, board_id, item_id, name, values, version, position)
+                # Separate from the page's transaction so the board version
+                # only moves for item changes; a crash in between just means
+                # the page is fetched again
+                with self._transaction() as conn:
+                    self._hold_lease(conn, board_id, owner, renew=True)
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO crawl_seen (board_id, item_id) VALUES (?, ?)",
+                        [(board_id, item_id) for item_id, _, _ in page],
+                    )
+                    conn.execute(
+                        "UPDATE crawl_checkpoints SET cursor = ?, position = ?, updated_at = ? WHERE board_id = ?",
+                        (cursor, position, time.time(), board_id),
+                    )
+                del page
+
+        with self._board_transaction(board_id) as (conn, version):
+            self._hold_lease(conn, board_id, owner)
+            missing = conn.execute(
+                """
+                SELECT item_id FROM items WHERE board_id = ? AND version <= ?
+                AND item_id NOT IN (SELECT item_id FROM crawl_seen WHERE board_id = ?)
+                """,
+                (board_id, started_version, board_id),
+            ).fetchall()
+            for (item_id,) in missing:
+                self._delete(conn, board_id, item_id, version)
+
+        with self._transaction() as conn:
+            self._hold_lease(conn, board_id, owner)
+            (count,) = conn.execute("SELECT COUNT(*) FROM crawl_seen WHERE board_id = ?", (board_id,)).fetchone()
+            conn.execute("UPDATE boards SET synced_at = ? WHERE board_id = ?", (started_at, board_id))
+            conn.execute("DELETE FROM crawl_checkpoints WHERE board_id = ?", (board_id,))
+            conn.execute("DELETE FROM crawl_seen WHERE board_id = ?", (board_id,))
+        return count
+
+    def _crawl_checkpoint(self, board_id):
+        # (cursor, position, started_version, started_at) of the crawl to
+        # continue; a new one when there is none or its cursor is too old
+        row = self._connect().execute(
+            "SELECT cursor, position, started_version, started_at, updated_at FROM crawl_checkpoints WHERE board_id = ?",
+            (board_id,),
+        ).fetchone()
+        if row is not None and (not row[0] or time.time() - row[4] < CRAWL_CURSOR_TTL_SECONDS):
+            if row[1]:
+                logger.info("Resuming crawl of board %s after %d items", board_id, row[1])
+            return row[:4]
+
+        self._clear_checkpoint(board_id)
+        checkpoint = (None, 0, self.version(board_id), time.time())
+        self._connect().execute(
+            """
+            INSERT INTO crawl_checkpoints (board_id, cursor, position, started_version, started_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            (board_id, *checkpoint, checkpoint[3]),
+        )
+        return checkpoint
+
+    def _clear_checkpoint(self, board_id):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM crawl_checkpoints WHERE board_id = ?", (board_id,))
+            conn.execute("DELETE FROM crawl_seen WHERE board_id = ?", (board_id,))
+
+    def crawl_progress(self, board_id):
+        # Items crawled so far by an unfinished crawl, None if there is none
+        row = self._connect().execute(
+            "SELECT position FROM crawl_checkpoints WHERE board_id = ?", (board_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def sync_columns(self, board_id, api_key):
+        # column ID -> title, used to resolve webhook events that only carry
+        # a columnId
+        columns = monday_client.fetch_board_columns(board_id, api_key)
+        if columns:
+            with self._connect() as conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO board_columns (board_id, column_id, title) VALUES (?, ?, ?)",
+                    [(board_id, column_id, title) for column_id, title in columns.items()],
+                )
+        return len(columns)
+
+    def column_count(self, board_id):
+        (count,) = self._connect().execute(
+            "SELECT COUNT(*) FROM board_columns WHERE board_id = ?", (board_id,)
+        ).fetchone()
+        return count
+
+    def item_count(self, board_id):
+        (count,) = self._connect().execute(
+            "SELECT COUNT(*) FROM items WHERE board_id = ?", (board_id,)
+        ).fetchone()
+        return count
+
+    def ensure_synced(self, board_id, api_key=None):
+        # A board that has never been crawled is seeded synchronously once
+        if self.synced_at(board_id) is None:
+            self.reconcile_board(board_id, api_key or monday_client.get_api_key())
+
+    def ensure_boards_synced(self, board_ids):
+        # Unseeded boards are crawled in parallel, so the first report's
+        # latency tracks the slowest board rather than the sum.
+        unsynced = [board_id for board_id in board_ids if self.synced_at(board_id) is None]
+        if not unsynced:
+            return
+        api_key = monday_client.get_api_key()
+        with ThreadPoolExecutor(max_workers=len(unsynced)) as pool:
+            list(pool.map(lambda board_id: self.ensure_synced(board_id, api_key), unsynced))
+
+
+_mirror = None
+_mirror_lock = threading.Lock()
+
+
+def get_mirror():
+    global _mirror
+    if _mirror is None:
+        with _mirror_lock:
+            if _mirror is None:
+                _mirror = BoardMirror(DB_PATH)
+    return _mirror
+
+
+# --- Background reconciliation
+
+def reconcile_once(mirror=None):
+    mirror = mirror or get_mirror()
+    api_key = monday_client.get_api_key()
+    mirror.refresh_stale(api_key)
+    for board in get_config().boards:
+        synced_at = mirror.synced_at(board.id)
+        if synced_at is None or time.time() - synced_at >= RECONCILE_SECONDS:
+            mirror.reconcile_board(board.id, api_key)
+            mirror.compact_history(board.id)
+
+
+def _reconcile_loop():
+    while True:
+        try:
+            reconcile_once()
+        except Exception:
+            logger.exception("Mirror reconciliation failed")
+        time.sleep(STALE_REFRESH_SECONDS)
+
+
+_reconciler = None
+
+
+def start_reconciler():
+    global _reconciler
+    if RECONCILE_SECONDS <= 0 or (_reconciler is not None and _reconciler.is_alive()):
+        return
+    _reconciler = threading.Thread(target=_reconcile_loop, name="mirror-reconciler", daemon=True)
+    _reconciler.start()
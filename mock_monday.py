@@ -0,0 +1,209 @@
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Stand-in for the monday.com GraphQL API, for load tests (loadtest.py) and
+# local runs without a token. It answers just the queries monday_client
+# sends: boards { items_page } / next_items_page, items(ids:), boards
+# { columns } and me, with the complexity figures the crawler sizes its
+# pages from. Every board ID gets --items generated deals (the same ones for
+# the same ID), and every response is delayed by --latency seconds plus
+# --item-latency per item returned.
+#
+#   python mock_monday.py --port 8765 --items 5000 --latency 0.15
+#   MONDAY_API_URL=http://127.0.0.1:8765/v2 MONDAY_API_KEY=test python app.py
+
+COLUMNS = [
+    ("dept", "Dept"),
+    ("country", "Country/Region"),
+    ("salesperson", "Salesperson"),
+    ("service", "Service"),
+    ("stage", "Stage"),
+    ("referral", "Referral Source Category"),
+    ("status", "Group Status"),
+    ("potential", "Potential"),
+    ("created", "Deal creation date"),
+    ("closed", "Close Date"),
+]
+
+COUNTRIES = [
+    "Brazil", "Mexico", "Argentina", "Spain", "United Kingdom", "Germany", "France", "United States",
+    "India", "China", "Hong Kong", "Japan", "Australia", "UAE", "Qatar", "",
+]
+DEPTS = ["COS", "CCT-GBA", "CCT-SH", "AG2", "AG2 TAX", "TAX", "Other", ""]
+SALESPEOPLE = ["Ana", "Bruno", "Chen", "Dana", "Eli", "Farah", ""]
+
+PAGE_LIMIT_DEFAULT = 25   # items_page without a limit, as on monday.com
+PAGE_LIMIT_MAX = 500
+COMPLEXITY_PER_ITEM = 20
+COMPLEXITY_BUDGET = 5_000_000   # per minute
+
+
+def make_items(board_id, count):
+    rnd = random.Random(board_id)
+    first_day = date(2023, 1, 1)
+    items = []
+    for index in range(count):
+        created = first_day + timedelta(days=rnd.randint(0, 700))
+        status = rnd.choice(["Active", "Active", "Won", "Lost"])
+        closed = "" if status == "Active" else str(created + timedelta(days=rnd.randint(0, 180)))
+        values = {
+            "Dept": rnd.choice(DEPTS),
+            "Country/Region": rnd.choice(COUNTRIES),
+            "Salesperson": rnd.choice(SALESPEOPLE),
+            "Service": rnd.choice(["Audit", "Tax", "Advisory", "Legal"]),
+            "Stage": rnd.choice(["Lead", "Proposal", "Negotiation"]),
+            "Referral Source Category": rnd.choice(["Web", "Partner", "Referral", "Event"]),
+            "Group Status": status,
+            "Potential": rnd.choice(["Hot", "Cold", "Warm"]),
+            "Deal creation date": str(created),
+            "Close Date": closed,
+        }
+        items.append({
+            "id": f"{board_id}{index:07d}",
+            "name": f"Deal {index}",
+            "column_values": [{"text": text, "column": {"title": title}} for title, text in values.items()],
+        })
+    return items
+
+
+class MockMonday:
+    def __init__(self, items=1000, latency=0.0, item_latency=0.0):
+        self.items = items
+        self.latency = latency
+        self.item_latency = item_latency
+        self.requests = 0
+        self._boards = {}
+        self._budget = [COMPLEXITY_BUDGET, time.monotonic() + 60]
+        self._lock = threading.Lock()
+
+    def board(self, board_id):
+        with self._lock:
+            if board_id not in self._boards:
+                self._boards[board_id] = make_items(board_id, self.items)
+            return self._boards[board_id]
+
+    def _charge(self, cost):
+        # (complexity dict, error) with a per-minute budget like monday.com's
+        with self._lock:
+            remaining, reset_at = self._budget
+            now = time.monotonic()
+            if now >= reset_at:
+                remaining, reset_at = COMPLEXITY_BUDGET, now + 60
+            reset_in = max(int(reset_at - now), 1)
+            complexity = {"query": cost, "before": remaining, "after": remaining, "reset_in_x_seconds": reset_in}
+            if cost > remaining:
+                self._budget = [remaining, reset_at]
+                return complexity, (
+                    f"ComplexityException: Complexity budget exhausted, query cost {cost} "
+                    f"budget remaining {remaining} out of {COMPLEXITY_BUDGET} reset in {reset_in} seconds"
+                )
+            complexity["after"] = remaining - cost
+            self._budget = [remaining - cost, reset_at]
+            return complexity, None
+
+    def _page(self, board_id, offset, limit):
+        items = self.board(board_id)
+        page = items[offset:offset + limit]
+        cursor = f"{board_id}:{offset + limit}" if offset + limit < len(items) else None
+        return {"cursor": cursor, "items": page}
+
+    def answer(self, query):
+        # -> (response payload, number of items in it)
+        self.requests += 1
+        limit = re.search(r"limit:\s*(\d+)", query)
+        limit = min(int(limit.group(1)), PAGE_LIMIT_MAX) if limit else PAGE_LIMIT_DEFAULT
+
+        cursor = re.search(r'next_items_page\([^)]*cursor:\s*"([^"]+)"', query)
+        if cursor or "items_page" in query:
+            complexity, error = self._charge(limit * COMPLEXITY_PER_ITEM)
+            if error:
+                return {"data": {"complexity": complexity}, "errors": [{"message": error}]}, 0
+            if cursor:
+                board_id, offset = cursor.group(1).split(":")
+                page = self._page(int(board_id), int(offset), limit)
+                data = {"next_items_page": page}
+            else:
+                board_id = int(re.search(r"boards\(ids:\s*\[?(\d+)", query).group(1))
+                data = {"boards": [{"items_page": self._page(board_id, 0, limit)}]}
+                page = data["boards"][0]["items_page"]
+            if "complexity" in query:
+                data["complexity"] = complexity
+            return {"data": data}, len(page["items"])
+
+        ids = re.search(r"items\(ids:\s*\[([^\]]*)\]", query)
+        if ids:
+            found = []
+            for item_id in filter(None, (part.strip() for part in ids.group(1).split(","))):
+                board_id, index = int(item_id[:-7]), int(item_id[-7:])
+                items = self.board(board_id)
+                if index < len(items):
+                    found.append(dict(items[index], board={"id": str(board_id)}))
+            return {"data": {"items": found}}, len(found)
+
+        if "columns" in query:
+            columns = [{"id": column_id, "title": title} for column_id, title in COLUMNS]
+            return {"data": {"boards": [{"columns": columns}]}}, 0
+
+        if "me {" in query:
+            return {"data": {"me": {"id": "1"}}}, 0
+
+        return {"errors": [{"message": "Unsupported query for the mock API"}]}, 0
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        api = self.server.api
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        payload, count = api.answer(body.get("query", ""))
+        time.sleep(api.latency + api.item_latency * count)
+
+        content = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(host="127.0.0.1", port=0, items=1000, latency=0.0, item_latency=0.0):
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    server.api = MockMonday(items, latency, item_latency)
+    return server
+
+
+def start_server(**options):
+    # Serves from a daemon thread; returns (server, API URL)
+    server = make_server(**options)
+    threading.Thread(target=server.serve_forever, name="mock-monday", daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}/v2"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mock monday.com GraphQL API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--items", type=int, default=1000, help="items per board")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--item-latency", type=float, default=0.0, help="seconds added per item returned")
+    args = parser.parse_args(argv)
+
+    server = make_server(args.host, args.port, args.items, args.latency, args.item_latency)
+    print(f"Mock monday.com API on http://{args.host}:{server.server_address[1]}/v2")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
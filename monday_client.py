@@ -0,0 +1,400 @@
+import json
+import os
+import re
+import sys
+import threading
+import time
+from typing import Optional
+
+# Optional fast JSON decoders: msgspec decodes items_page responses straight
+# into typed structs, orjson is a faster drop-in for everything else, and the
+# stdlib json module is the fallback when neither is installed.
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Thin wrapper around the monday.com GraphQL API shared by the report
+# (sync.py) and the local board mirror (mirror.py).
+
+API_URL = os.environ.get("MONDAY_API_URL", "https://api.monday.com/v2")
+# Keep-alive connections kept open to the API; parallel board crawls each
+# hold one while they page through a board.
+HTTP_POOL_SIZE = int(os.environ.get("MONDAY_HTTP_POOL_SIZE", 10))
+HTTP_TIMEOUT_SECONDS = float(os.environ.get("MONDAY_HTTP_TIMEOUT_SECONDS", 60))
+
+ITEM_FIELDS = "id name column_values { text column { title } }"
+COMPLEXITY_FIELDS = "complexity { query before after reset_in_x_seconds }"
+
+# items_page limits: crawls start at PAGE_LIMIT_START and adapt within
+# [PAGE_LIMIT_MIN, PAGE_LIMIT_MAX] (500 is monday.com's cap); one page may
+# use at most PAGE_BUDGET_SHARE of the complexity budget that is left.
+PAGE_LIMIT_MIN = int(os.environ.get("MONDAY_PAGE_LIMIT_MIN", 25))
+PAGE_LIMIT_MAX = int(os.environ.get("MONDAY_PAGE_LIMIT_MAX", 500))
+PAGE_LIMIT_START = int(os.environ.get("MONDAY_PAGE_LIMIT_START", 100))
+PAGE_BUDGET_SHARE = float(os.environ.get("MONDAY_PAGE_BUDGET_SHARE", 0.25))
+# Retries of a page rejected for complexity, after waiting for the budget
+COMPLEXITY_RETRIES = int(os.environ.get("MONDAY_COMPLEXITY_RETRIES", 3))
+
+
+class MondayAPIError(RuntimeError):
+    pass
+
+
+class CursorExpiredError(MondayAPIError):
+    # items_page cursors are only valid for a limited time (60 minutes)
+    pass
+
+
+def get_api_key():
+    api_key = os.environ.get("MONDAY_API_KEY")
+    if not api_key:
+        raise ValueError("MONDAY_API_KEY environment variable not set.")
+    return api_key
+
+
+# --- JSON decoding
+
+loads = orjson.loads if orjson else json.loads
+
+if msgspec:
+    class _Column(msgspec.Struct):
+        title: str
+
+    class _ColumnValue(msgspec.Struct):
+        text: Optional[str] = None
+        column: Optional[_Column] = None
+
+    class _Item(msgspec.Struct):
+        id: str
+        name: Optional[str] = None
+        column_values: list[_ColumnValue] = []
+
+    class _ItemsPage(msgspec.Struct):
+        cursor: Optional[str] = None
+        items: list[_Item] = []
+
+    class _Complexity(msgspec.Struct):
+        query: float = 0
+        before: float = 0
+        after: float = 0
+        reset_in_x_seconds: float = 0
+
+    class _Board(msgspec.Struct):
+        items_page: Optional[_ItemsPage] = None
+
+    class _PageData(msgspec.Struct):
+        boards: Optional[list[_Board]] = None
+        next_items_page: Optional[_ItemsPage] = None
+        complexity: Optional[_Complexity] = None
+
+    class _PageResponse(msgspec.Struct):
+        data: Optional[_PageData] = None
+        errors: Optional[list] = None
+        error_message: Optional[str] = None
+
+    _page_decoder = msgspec.json.Decoder(_PageResponse)
+
+
+def _title(title):
+    # Every item repeats the same handful of column titles; interning makes
+    # them share one string object instead of one copy per item.
+    return sys.intern(title)
+
+
+def item_values(item):
+    # column_values -> {column title: text}, in board column order
+    values = {}
+    for col in item.get("column_values") or []:
+        if col.get("column") and "title" in col["column"]:
+            values[_title(col["column"]["title"])] = col["text"]
+    return values
+
+
+def decode_page(content):
+    # Returns (items, cursor, errors, complexity) for an items_page /
+    # next_items_page response, with items normalised to (id, name,
+    # {title: text}) tuples. items is None when the response carried no page
+    # at all; complexity is the {query, before, after, reset_in_x_seconds}
+    # dict when the query asked for it. errors also carries the top-level
+    # error_message monday.com sends with some HTTP 200 failures.
+    if msgspec:
+        response = _page_decoder.decode(content)
+        errors = _errors(response.errors, response.error_message)
+        data = response.data
+        page = complexity = None
+        if data is not None:
+            page = data.next_items_page or (data.boards[0].items_page if data.boards else None)
+            if data.complexity is not None:
+                complexity = msgspec.structs.asdict(data.complexity)
+        if page is None:
+            return None, None, errors, complexity
+        items = [
+            (item.id, item.name, {_title(cv.column.title): cv.text for cv in item.column_values if cv.column})
+            for item in page.items
+        ]
+        return items, page.cursor, errors, complexity
+
+    response = loads(content)
+    errors = _errors(response.get("errors"), response.get("error_message"))
+    data = response.get("data")
+    page = complexity = None
+    if data:
+        page = data.get("next_items_page") or (data["boards"][0]["items_page"] if data.get("boards") else None)
+        complexity = data.get("complexity")
+    if not page:
+        return None, None, errors, complexity
+    items = [(str(item["id"]), item["name"], item_values(item)) for item in page.get("items", [])]
+    return items, page.get("cursor"), errors, complexity
+
+
+def _errors(errors, error_message):
+    if not errors and error_message:
+        return [{"message": error_message}]
+    return errors
+
+
+# --- Complexity budget
+#
+# monday.com meters API use in complexity points per minute, per account, so
+# every crawl in the process draws on the same budget. Each page query asks
+# for its own cost and the points left; the budget keeps the latest figures
+# plus the estimated cost of the queries still in flight, and makes a query
+# wait for the reset instead of sending it into a complexity error.
+
+class ComplexityBudget:
+    def __init__(self):
+        self._cond = threading.Condition()
+        self.remaining = None   # points left after the latest response
+        self.reset_at = None    # time.monotonic() at which the budget refills
+        self.reserved = 0       # estimated cost of the queries in flight
+
+    def _available(self):
+        # None while unknown or since the last reset
+        if self.remaining is None or (self.reset_at is not None and time.monotonic() >= self.reset_at):
+            return None
+        return self.remaining - self.reserved
+
+    def available(self):
+        with self._cond:
+            return self._available()
+
+    def acquire(self, cost):
+        # Blocks until a query estimated at `cost` fits in the budget
+        with self._cond:
+            while True:
+                available = self._available()
+                if available is None or 0 < available >= cost or (not self.reserved and self.reset_at is None):
+                    self.reserved += cost
+                    return
+                timeout = None if self.reset_at is None else max(self.reset_at - time.monotonic(), 0.05)
+                self._cond.wait(timeout)
+
+    def release(self, cost, complexity=None):
+        with self._cond:
+            self.reserved -= cost
+            if complexity:
+                self.remaining = complexity["after"]
+                self.reset_at = time.monotonic() + complexity["reset_in_x_seconds"]
+            self._cond.notify_all()
+
+    def exhausted(self, reset_in):
+        # After a complexity error: nothing left until the reset
+        with self._cond:
+            self.remaining = 0
+            self.reset_at = time.monotonic() + reset_in
+
+    def status(self):
+        with self._cond:
+            return {"remaining": self._available(), "in_flight": self.reserved}
+
+
+_budget = ComplexityBudget()
+
+
+def get_complexity_budget():
+    return _budget
+
+
+class PageSizer:
+    # Picks each page's limit for one crawl. Bigger pages mean fewer round
+    # trips for the same points per item, so the limit keeps doubling unless
+    # the items per second clearly drop (> 10%); after two such pages in a
+    # row it settles on the best size seen. It never asks for more items
+    # than the budget share left, at the cost per item of the pages so far.
+
+    def __init__(self, budget, limit=PAGE_LIMIT_START):
+        self.budget = budget
+        self.limit = limit
+        self.cost_per_item = None
+        self.best = None   # (items per second, limit)
+        self.slow_pages = 0
+
+    def next_limit(self):
+        limit = self.limit
+        available = self.budget.available()
+        if available is not None and self.cost_per_item:
+            limit = min(limit, int(available * PAGE_BUDGET_SHARE / self.cost_per_item))
+        return max(PAGE_LIMIT_MIN, min(limit, PAGE_LIMIT_MAX))
+
+    def estimate(self, limit):
+        return limit * self.cost_per_item if self.cost_per_item else 0
+
+    def record(self, limit, count, seconds, complexity):
+        if complexity and complexity.get("query"):
+            self.cost_per_item = complexity["query"] / limit
+        if count < limit:
+            return  # a short (last) page says nothing about the rate
+        rate = count / max(seconds, 1e-3)
+        if self.slow_pages >= 2:
+            return
+        if self.best is None or rate >= self.best[0] * 0.9:
+            if self.best is None or rate > self.best[0]:
+                self.best = (rate, limit)
+            self.slow_pages = 0
+            self.limit = min(limit * 2, PAGE_LIMIT_MAX)
+        else:
+            self.slow_pages += 1
+            self.limit = self.best[1]
+
+    def rejected(self, limit):
+        # The page was too expensive: halve it and start measuring again
+        self.limit = max(limit // 2, PAGE_LIMIT_MIN)
+        self.best = None
+        self.slow_pages = 0
+
+
+def _complexity_error(errors):
+    # Seconds until the budget resets when errors is a complexity error
+    text = str(errors)
+    if "complexity" not in text.lower():
+        return None
+    match = re.search(r"reset in (\d+) seconds?", text)
+    return int(match.group(1)) if match else 60
+
+
+# --- Requests
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    # One pooled session per process, so consecutive pages and parallel
+    # crawls reuse TLS connections instead of handshaking per request
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                import requests  # deferred: only the mirror crawl talks to the API, not app startup
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_SIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def session_ready():
+    return _session is not None
+
+
+def post_query(query, api_key):
+    response = get_session().post(
+        API_URL, json={"query": query}, headers={"Authorization": api_key}, timeout=HTTP_TIMEOUT_SECONDS
+    )
+    return response.content if response.status_code == 200 else None
+
+
+def run_query(query, api_key):
+    content = post_query(query, api_key)
+    return loads(content) if content is not None else None
+
+
+def iter_board_pages(board_id, api_key, cursor=None):
+    # Yields (items, next cursor) per items_page / next_items_page call, items
+    # being (id, name, {title: text}); the last page has no next cursor. A
+    # cursor from an earlier crawl resumes that crawl after its last page.
+    # Page sizes follow the complexity budget (see PageSizer).
+    budget = get_complexity_budget()
+    sizer = PageSizer(budget)
+    rejections = 0
+    while True:
+        limit = sizer.next_limit()
+        if cursor:
+            query = f"""query {{ {COMPLEXITY_FIELDS} next_items_page(limit: {limit}, cursor: "{cursor}") {{ cursor items {{ {ITEM_FIELDS} }} }} }}"""
+        else:
+            query = f"""query {{ {COMPLEXITY_FIELDS} boards(ids: {board_id}) {{ items_page(limit: {limit}) {{ cursor items {{ {ITEM_FIELDS} }} }} }} }}"""
+
+        # A failed page must not look like the end of the board: the mirror
+        # prunes items it didn't see, so a truncated crawl would delete data.
+        cost = sizer.estimate(limit)
+        budget.acquire(cost)
+        started = time.monotonic()
+        try:
+            content = post_query(query, api_key)
+        except BaseException:
+            budget.release(cost)
+            raise
+        seconds = time.monotonic() - started
+        if content is None:
+            budget.release(cost)
+            raise MondayAPIError(f"monday.com request failed for board {board_id}")
+
+        # The raw response is dropped as soon as it's decoded, so at most one
+        # page is held at a time. A response without a page is never the end
+        # of the board (the last page comes without a next cursor): it's an
+        # error, or boards: [] once the token can no longer see the board.
+        items, next_cursor, errors, complexity = decode_page(content)
+        del content
+        budget.release(cost, complexity)
+        if items is None:
+            reset_in = _complexity_error(errors) if errors else None
+            if reset_in is not None and rejections < COMPLEXITY_RETRIES:
+                rejections += 1
+                budget.exhausted(reset_in)
+                sizer.rejected(limit)
+                continue
+            if errors and cursor and "cursor" in str(errors).lower():
+                raise CursorExpiredError(f"monday.com rejected the items_page cursor for board {board_id}: {errors}")
+            raise MondayAPIError(
+                f"monday.com request failed for board {board_id}: {errors or 'no items_page in the response'}"
+            )
+        rejections = 0
+        sizer.record(limit, len(items), seconds, complexity)
+        cursor = next_cursor
+        yield items, cursor
+        del items
+        if not cursor: break
+
+
+def ping(api_key):
+    # Cheapest authenticated query; opens a pooled connection as a side effect
+    data = run_query("query { me { id } }", api_key)
+    return bool(data and data.get("data"))
+
+
+def fetch_items_by_id(item_ids, api_key, chunk_size=100):
+    items = []
+    item_ids = list(item_ids)
+    for i in range(0, len(item_ids), chunk_size):
+        ids = ", ".join(str(item_id) for item_id in item_ids[i:i + chunk_size])
+        data = run_query(f"""query {{ items(ids: [{ids}]) {{ {ITEM_FIELDS} board {{ id }} }} }}""", api_key)
+        if not data or not data.get("data"):
+            return None
+        items.extend(data["data"].get("items") or [])
+    return items
+
+
+def fetch_board_columns(board_id, api_key):
+    data = run_query(f"""query {{ boards(ids: {board_id}) {{ columns {{ id title }} }} }}""", api_key)
+    if not data or not data.get("data") or not data["data"].get("boards"):
+        return {}
+    return {col["id"]: col["title"] for col in data["data"]["boards"][0]["columns"]}
@@ -0,0 +1,55 @@
+import argparse
+import json
+import os
+import sys
+
+import requests
+
+import mirror
+
+# Replays recorded monday.com webhook events, one JSON payload per line.
+# Lines may be full webhook bodies ({"event": {...}}) or bare events.
+#
+#   python replay_events.py events.jsonl                  # POST to a running app
+#   python replay_events.py events.jsonl --local          # apply straight to the mirror DB
+#   python replay_events.py events.jsonl --url http://localhost:5000/webhooks/monday
+
+
+def read_events(path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            payload = json.loads(line)
+            yield payload if "event" in payload else {"event": payload}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay monday.com webhook events")
+    parser.add_argument("events", help="JSONL file of recorded events")
+    parser.add_argument("--url", default="http://localhost:5000/webhooks/monday")
+    parser.add_argument("--local", action="store_true", help="apply to the mirror DB without a server")
+    args = parser.parse_args(argv)
+
+    secret = os.environ.get("MONDAY_SIGNING_SECRET")
+    board_mirror = mirror.get_mirror() if args.local else None
+
+    count = 0
+    for payload in read_events(args.events):
+        if board_mirror:
+            board_mirror.apply_event(payload["event"])
+        else:
+            headers = {"Authorization": mirror.make_webhook_token(secret)} if secret else {}
+            response = requests.post(args.url, json=payload, headers=headers)
+            if response.status_code != 200:
+                print(f"Event {count + 1} rejected: {response.status_code} {response.text}", file=sys.stderr)
+                return 1
+        count += 1
+
+    print(f"Replayed {count} events")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
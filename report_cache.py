@@ -0,0 +1,353 @@
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import admission
+from mirror import get_mirror
+from report_config import get_config
+
+# sync (pandas, openpyxl) is imported on the first report rather than here,
+# so the web app starts without it; background.warm_imports() loads it early.
+
+# Finished report workbooks, keyed by window + boards + the mirror version of
+# each board (and the config fingerprint), so an entry is only ever served
+# while the data it was built from is unchanged. Entries live in a per-process
+# LRU backed by a SQLite file shared by every worker on the instance.
+
+logger = logging.getLogger(__name__)
+
+CACHE_TTL_SECONDS = int(os.environ.get("REPORT_CACHE_TTL_SECONDS", 24 * 3600))
+CACHE_MAX_ENTRIES = int(os.environ.get("REPORT_CACHE_MAX_ENTRIES", 32))
+# Shared tier; set REPORT_CACHE_DB_PATH to an empty string to keep reports in memory only
+CACHE_DB_PATH = os.environ.get(
+    "REPORT_CACHE_DB_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "report_cache.sqlite3"),
+)
+CACHE_DISK_MAX_ENTRIES = int(os.environ.get("REPORT_CACHE_DISK_MAX_ENTRIES", 128))
+
+# Report models (see sync.ReportModel) for recently requested windows; a
+# cache miss patches the window's model with the mirror changes instead of
+# recomputing the whole report.
+MODEL_CACHE_MAX_ENTRIES = int(os.environ.get("REPORT_MODEL_CACHE_MAX_ENTRIES", 4))
+
+# Identical concurrent requests are built once (see SingleFlight / build_once).
+# A lease older than this is treated as abandoned (e.g. its worker was
+# killed) and another worker takes over; keep it above the gunicorn timeout.
+LEASE_SECONDS = int(os.environ.get("REPORT_LEASE_SECONDS", 180))
+LEASE_POLL_SECONDS = float(os.environ.get("REPORT_LEASE_POLL_SECONDS", 0.25))
+
+
+class DiskCache:
+    # Reports every gunicorn worker can see: a report built by one worker is
+    # served by the others without being generated again. Failures here are
+    # logged and treated as misses; the in-memory tier keeps working.
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS reports (
+        key TEXT PRIMARY KEY,
+        expires_at REAL NOT NULL,
+        stored_at REAL NOT NULL,
+        data BLOB NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS leases (
+        key TEXT PRIMARY KEY,
+        owner TEXT NOT NULL,
+        expires_at REAL NOT NULL
+    );
+    """
+
+    def __init__(self, path, ttl=CACHE_TTL_SECONDS, max_entries=CACHE_DISK_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(self.SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        try:
+            row = self._connect().execute(
+                "SELECT data FROM reports WHERE key = ? AND expires_at >= ?", (key, time.time())
+            ).fetchone()
+        except sqlite3.Error:
+            logger.exception("Report cache read failed")
+            return None
+        return row[0] if row else None
+
+    def put(self, key, data):
+        now = time.time()
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO reports (key, expires_at, stored_at, data) VALUES (?, ?, ?, ?)",
+                    (key, now + self.ttl, now, data),
+                )
+                conn.execute("DELETE FROM reports WHERE expires_at < ?", (now,))
+                conn.execute(
+                    "DELETE FROM reports WHERE key NOT IN (SELECT key FROM reports ORDER BY stored_at DESC LIMIT ?)",
+                    (self.max_entries,),
+                )
+        except sqlite3.Error:
+            logger.exception("Report cache write failed")
+
+    # --- Build leases: at most one worker builds a given report at a time
+
+    def acquire_lease(self, key, owner, seconds=LEASE_SECONDS):
+        now = time.time()
+        try:
+            conn = self._connect()
+            conn.execute("DELETE FROM leases WHERE key = ? AND expires_at < ?", (key, now))
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO leases (key, owner, expires_at) VALUES (?, ?, ?)", (key, owner, now + seconds)
+            )
+        except sqlite3.Error:
+            # Without the shared DB there's nobody to coordinate with
+            logger.exception("Report lease failed")
+            return True
+        return cursor.rowcount == 1
+
+    def release_lease(self, key, owner):
+        try:
+            self._connect().execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, owner))
+        except sqlite3.Error:
+            logger.exception("Report lease release failed")
+
+    def available(self):
+        try:
+            self._connect().execute("SELECT 1 FROM reports LIMIT 1").fetchall()
+            return True
+        except sqlite3.Error:
+            return False
+
+
+class ReportCache:
+    def __init__(self, ttl=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES, disk=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.disk = disk
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, data = entry
+                if expires_at >= time.time():
+                    self._entries.move_to_end(key)
+                    return data
+                del self._entries[key]
+
+        data = self.disk.get(key) if self.disk else None
+        if data is not None:
+            self._remember(key, data)
+        return data
+
+    def status(self):
+        with self._lock:
+            entries = len(self._entries)
+        return {
+            "ok": self.disk.available() if self.disk else True,
+            "entries": entries,
+            "disk": self.disk.path if self.disk else None,
+        }
+
+    def put(self, key, data):
+        self._remember(key, data)
+        if self.disk:
+            self.disk.put(key, data)
+
+    def _remember(self, key, data):
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, data)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+_cache = ReportCache(disk=DiskCache(CACHE_DB_PATH) if CACHE_DB_PATH else None)
+
+
+def get_report_cache():
+    return _cache
+
+
+class SingleFlight:
+    # Concurrent calls with the same key share one execution: the first
+    # caller runs fn, the rest wait on its Future and get the same result
+    # (or exception).
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+_flights = SingleFlight()
+
+
+def build_once(key, build):
+    # Cross-worker half of the single-flight: the process that holds the
+    # lease builds and publishes to the shared cache; the others poll the
+    # cache until the report shows up or the lease is given up / expires.
+    data = _cache.get(key)
+    if data is not None:
+        return data
+    if _cache.disk is None:
+        return _publish(key, build())
+
+    owner = f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+    while not _cache.disk.acquire_lease(key, owner):
+        time.sleep(LEASE_POLL_SECONDS)
+        data = _cache.get(key)
+        if data is not None:
+            return data
+
+    try:
+        # The previous holder may have published just before letting go
+        data = _cache.get(key)
+        return data if data is not None else _publish(key, build())
+    finally:
+        _cache.disk.release_lease(key, owner)
+
+
+def _publish(key, data):
+    _cache.put(key, data)
+    return data
+
+
+def report_key(boards, start_date, end_date, mirror, config, as_of=None, **options):
+    # A past (as_of) state never changes, so the timestamp stands in for the versions
+    if as_of is None:
+        versions = ",".join(f"{board.id}@{mirror.version(board.id)}" for board in boards)
+    else:
+        versions = ",".join(f"{board.id}@as_of={as_of}" for board in boards)
+    extra = ",".join(f"{name}={value}" for name, value in sorted(options.items()))
+    return f"{start_date}|{end_date}|{versions}|{config.fingerprint}|{extra}"
+
+
+def get_report(start_date, end_date, board_ids=None, detail=True, as_of=None, priority=admission.INTERACTIVE):
+    # Returns the workbook bytes, from the cache when the boards haven't
+    # changed since it was built. detail=False is the summary-only workbook;
+    # as_of (epoch seconds) reports on the boards as they were at that time.
+    # Builds go through admission control at the given priority (cache hits
+    # don't) and may raise admission.AdmissionRejected.
+    config = get_config()
+    boards = config.resolve_boards(board_ids)
+    mirror = get_mirror()
+    if as_of is not None and as_of >= time.time():
+        as_of = None
+    if as_of is None:
+        mirror.ensure_boards_synced([board.id for board in boards])
+
+    options = {} if detail else {"summary_only": True}
+    key = report_key(boards, start_date, end_date, mirror, config, as_of, **options)
+    data = _cache.get(key)
+    if data is None:
+        data = _flights.do(key, lambda: build_once(
+            key, lambda: build_admitted(boards, start_date, end_date, mirror, config, detail, as_of, priority)
+        ))
+    return data
+
+
+def build_admitted(boards, start_date, end_date, mirror, config, detail, as_of, priority):
+    cost = admission.estimate_report_cost(boards, mirror, config, detail)
+    with admission.get_admission_controller().admit(cost, priority):
+        return render_latest(boards, start_date, end_date, mirror, config, detail, as_of)
+
+
+_intervals = {}
+_intervals_lock = threading.Lock()
+
+
+def get_deal_intervals(board_ids=None):
+    # One interval index per board set, rebuilt when any board's mirror
+    # version (or the config) moves on
+    from sync import build_deal_intervals
+
+    config = get_config()
+    boards = config.resolve_boards(board_ids)
+    mirror = get_mirror()
+    mirror.ensure_boards_synced([board.id for board in boards])
+
+    board_key = tuple(board.id for board in boards)
+    version = (tuple(mirror.version(board.id) for board in boards), config.fingerprint)
+    with _intervals_lock:
+        cached = _intervals.get(board_key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    intervals = build_deal_intervals(boards, mirror, config)
+    with _intervals_lock:
+        _intervals[board_key] = (version, intervals)
+    return intervals
+
+
+_models = OrderedDict()
+_models_lock = threading.Lock()
+
+
+def render_latest(boards, start_date, end_date, mirror, config, detail=True, as_of=None):
+    # Summary-only and full renders share the window's model
+    from sync import build_report_model, render_report, update_report_model
+
+    if as_of is not None:
+        # Rebuilt from the mirror history; the workbook cache covers repeats
+        model = build_report_model(start_date, end_date, boards, mirror, config, as_of)
+        return render_report(model, detail=detail).getvalue()
+
+    model_key = (start_date, end_date, tuple(board.id for board in boards), config.fingerprint)
+    with _models_lock:
+        model = _models.get(model_key)
+        if model is not None:
+            _models.move_to_end(model_key)
+
+    if model is not None:
+        with model.lock:
+            if update_report_model(model, mirror):
+                return render_report(model, detail=detail).getvalue()
+
+    model = build_report_model(start_date, end_date, boards, mirror, config)
+    with model.lock:
+        data = render_report(model, detail=detail).getvalue()
+
+    with _models_lock:
+        _models[model_key] = model
+        _models.move_to_end(model_key)
+        while len(_models) > MODEL_CACHE_MAX_ENTRIES:
+            _models.popitem(last=False)
+    return data
@@ -0,0 +1,161 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from dataclasses import dataclass, field, replace
+
+# Board / column / desk taxonomy lives in report_config.json so it can be
+# changed without touching the report code. The file is compiled once into
+# lookup tables and recompiled automatically when its mtime changes.
+
+logger = logging.getLogger(__name__)
+
+CONFIG_PATH = os.environ.get(
+    "REPORT_CONFIG_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "report_config.json"),
+)
+
+
+WEEKDAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+
+
+def normalize_country(value):
+    return str(value).strip().upper()
+
+
+@dataclass(frozen=True)
+class BoardConfig:
+    id: int
+    name: str
+    # board column title -> canonical title used by the report
+    columns: dict = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class ScheduleConfig:
+    name: str
+    weekdays: frozenset     # 0 = Monday
+    at: tuple               # (hour, minute) in the config timezone
+    days: int               # report window is [run date - days, run date]
+    board_ids: tuple = ()   # empty -> default board
+
+
+@dataclass(frozen=True)
+class ReportConfig:
+    boards: tuple
+    departments: tuple      # (name, compiled regex) in report order
+    desks: tuple            # desk names in report order
+    section_desks: tuple    # desks that get their own "Individual Desks" block
+    country_to_desk: dict   # normalized country -> desk
+    default_desk: str
+    schedules: tuple = ()
+    timezone: str = "UTC"
+    fingerprint: str = ""   # hash of the source file, part of report cache keys
+
+    @property
+    def default_board(self):
+        return self.boards[0]
+
+    def board(self, board_id=None):
+        if board_id is None:
+            return self.default_board
+        for board in self.boards:
+            if board.id == int(board_id):
+                return board
+        raise ValueError(f"Board {board_id} is not configured.")
+
+    def resolve_boards(self, board_ids=None):
+        # None -> default board; a single ID or a list of IDs, de-duplicated
+        if board_ids is None or isinstance(board_ids, (int, str)):
+            board_ids = [board_ids]
+        boards = {}
+        for board_id in board_ids:
+            board = self.board(board_id)
+            boards.setdefault(board.id, board)
+        return list(boards.values())
+
+    def desk_for(self, country):
+        if country is None:
+            return self.default_desk
+        return self.country_to_desk.get(normalize_country(country), self.default_desk)
+
+
+def compile_config(raw):
+    boards = tuple(
+        BoardConfig(id=int(b["id"]), name=b.get("name", str(b["id"])), columns=dict(b.get("columns", {})))
+        for b in raw["boards"]
+    )
+    if not boards:
+        raise ValueError("report config must define at least one board.")
+
+    departments = tuple(
+        (d["name"], re.compile(d["pattern"], re.IGNORECASE)) for d in raw["departments"]
+    )
+
+    country_to_desk = {}
+    for desk in raw["desks"]:
+        for country in desk["countries"]:
+            key = normalize_country(country)
+            if key in country_to_desk and country_to_desk[key] != desk["name"]:
+                raise ValueError(
+                    f"{country} is mapped to both {country_to_desk[key]} and {desk['name']}."
+                )
+            country_to_desk[key] = desk["name"]
+
+    schedules = []
+    for schedule in raw.get("schedules", []):
+        hour, minute = (int(part) for part in schedule["time"].split(":"))
+        schedules.append(ScheduleConfig(
+            name=schedule.get("name", schedule["time"]),
+            weekdays=frozenset(WEEKDAYS.index(day.lower()[:3]) for day in schedule["weekdays"]),
+            at=(hour, minute),
+            days=int(schedule.get("days", 7)),
+            board_ids=tuple(int(board_id) for board_id in schedule.get("boards", [])),
+        ))
+
+    return ReportConfig(
+        boards=boards,
+        departments=departments,
+        desks=tuple(d["name"] for d in raw["desks"]),
+        section_desks=tuple(d["name"] for d in raw["desks"] if d.get("section", True)),
+        country_to_desk=country_to_desk,
+        default_desk=raw.get("default_desk", "Others"),
+        schedules=tuple(schedules),
+        timezone=raw.get("timezone", "UTC"),
+    )
+
+
+# --- Cached loader (hot reload on file change)
+
+_lock = threading.Lock()
+_cached = None
+_cached_mtime = None
+
+
+def get_config(path=None):
+    global _cached, _cached_mtime
+    path = path or CONFIG_PATH
+    mtime = os.stat(path).st_mtime_ns
+    if _cached is not None and _cached_mtime == (path, mtime):
+        return _cached
+
+    with _lock:
+        if _cached is None or _cached_mtime != (path, mtime):
+            try:
+                with open(path, "rb") as f:
+                    source = f.read()
+                compiled = replace(
+                    compile_config(json.loads(source)),
+                    fingerprint=hashlib.sha1(source).hexdigest()[:12],
+                )
+            except (ValueError, KeyError, TypeError, re.error):
+                # A half-saved or broken edit shouldn't take reports down:
+                # keep serving the last good config until the file is fixed.
+                if _cached is None:
+                    raise
+                logger.exception("Ignoring invalid report config at %s", path)
+                return _cached
+            _cached, _cached_mtime = compiled, (path, mtime)
+        return _cached
@@ -0,0 +1,191 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import admission
+import report_cache
+from report_config import get_config
+
+# Progressive report jobs (/reports/jobs). A job first publishes the
+# summary-only workbook, which takes a fraction of the full build, and then
+# attaches the full workbook once the department / desk / salesperson
+# sections are done. Job state and finished parts live in SQLite so any
+# gunicorn worker can answer status and download requests for any job; so do
+# the memory profiles of profiled reports (memory_profile.py).
+
+logger = logging.getLogger(__name__)
+
+JOBS_DB_PATH = os.environ.get(
+    "REPORT_JOBS_DB_PATH",
+    report_cache.CACHE_DB_PATH or os.path.join(os.path.dirname(os.path.abspath(__file__)), "report_cache.sqlite3"),
+)
+JOB_TTL_SECONDS = int(os.environ.get("REPORT_JOB_TTL_SECONDS", 3600))
+JOB_WORKERS = int(os.environ.get("REPORT_JOB_WORKERS", 2))
+
+# Parts in the order a job publishes them
+PARTS = ("summary", "full")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    params TEXT NOT NULL,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS job_parts (
+    job_id TEXT NOT NULL,
+    part TEXT NOT NULL,
+    data BLOB NOT NULL,
+    PRIMARY KEY (job_id, part)
+);
+CREATE TABLE IF NOT EXISTS memory_profiles (
+    profile_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+
+class JobStore:
+    def __init__(self, path, ttl=JOB_TTL_SECONDS):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def create(self, params):
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        conn = self._connect()
+        conn.execute(
+            "DELETE FROM job_parts WHERE job_id IN (SELECT job_id FROM jobs WHERE updated_at < ?)", (now - self.ttl,)
+        )
+        conn.execute("DELETE FROM jobs WHERE updated_at < ?", (now - self.ttl,))
+        conn.execute(
+            "INSERT INTO jobs (job_id, status, params, created_at, updated_at) VALUES (?, 'running', ?, ?, ?)",
+            (job_id, json.dumps(params), now, now),
+        )
+        return job_id
+
+    def publish(self, job_id, part, data, status):
+        conn = self._connect()
+        conn.execute("INSERT OR REPLACE INTO job_parts (job_id, part, data) VALUES (?, ?, ?)", (job_id, part, data))
+        conn.execute("UPDATE jobs SET status = ?, updated_at = ? WHERE job_id = ?", (status, time.time(), job_id))
+
+    def fail(self, job_id, error):
+        self._connect().execute(
+            "UPDATE jobs SET status = 'failed', error = ?, updated_at = ? WHERE job_id = ?",
+            (error, time.time(), job_id),
+        )
+
+    def get(self, job_id):
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT status, params, error, created_at, updated_at FROM jobs WHERE job_id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        status, params, error, created_at, updated_at = row
+        ready = {part for (part,) in conn.execute("SELECT part FROM job_parts WHERE job_id = ?", (job_id,))}
+        return {
+            "job_id": job_id,
+            "status": status,
+            "params": json.loads(params),
+            "error": error,
+            "parts": [part for part in PARTS if part in ready],
+            "seconds": round(updated_at - created_at, 3),
+        }
+
+    def part(self, job_id, part):
+        row = self._connect().execute(
+            "SELECT data FROM job_parts WHERE job_id = ? AND part = ?", (job_id, part)
+        ).fetchone()
+        return row[0] if row else None
+
+    def save_profile(self, profile):
+        now = time.time()
+        profile_id = uuid.uuid4().hex
+        conn = self._connect()
+        conn.execute("DELETE FROM memory_profiles WHERE created_at < ?", (now - self.ttl,))
+        conn.execute(
+            "INSERT INTO memory_profiles (profile_id, data, created_at) VALUES (?, ?, ?)",
+            (profile_id, json.dumps(profile), now),
+        )
+        return profile_id
+
+    def profile(self, profile_id):
+        row = self._connect().execute(
+            "SELECT data FROM memory_profiles WHERE profile_id = ?", (profile_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+
+_store = JobStore(JOBS_DB_PATH)
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_job_store():
+    return _store
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="report-job")
+    return _executor
+
+
+def start_job(start_date, end_date, board_ids=None):
+    # Board IDs are checked here so a bad request fails immediately instead
+    # of as a failed job
+    boards = get_config().resolve_boards(board_ids)
+    params = {
+        "start_date": str(start_date),
+        "end_date": str(end_date),
+        "board_ids": [board.id for board in boards],
+    }
+    job_id = _store.create(params)
+    _get_executor().submit(run_job, job_id, start_date, end_date, params["board_ids"])
+    return job_id
+
+
+def summary_report(start_date, end_date, board_ids):
+    # Someone is waiting on the job for the summary, so it's admitted ahead
+    # of batch work like any interactive build; if it's turned away, the job
+    # waits its turn and asks again instead of failing
+    while True:
+        try:
+            return report_cache.get_report(start_date, end_date, board_ids=board_ids, detail=False,
+                                           priority=admission.INTERACTIVE)
+        except admission.AdmissionRejected as e:
+            time.sleep(e.retry_after)
+
+
+def run_job(job_id, start_date, end_date, board_ids):
+    try:
+        summary = summary_report(start_date, end_date, board_ids)
+        _store.publish(job_id, "summary", summary, "summary_ready")
+        full = report_cache.get_report(start_date, end_date, board_ids=board_ids, priority=admission.BATCH)
+        _store.publish(job_id, "full", full, "done")
+    except Exception as e:
+        logger.exception("Report job %s failed", job_id)
+        _store.fail(job_id, str(e))
@@ -0,0 +1,159 @@
+from dataclasses import dataclass
+
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+from openpyxl.styles.fonts import DEFAULT_FONT
+from openpyxl.utils import get_column_letter
+
+# Static parts of the Summary Report sheet, prepared once at import: every
+# style the report uses, the fixed header rows and the column layout. Each
+# new workbook registers the styles as named styles, so styling a cell is a
+# single assignment instead of building and de-duplicating Font / Border /
+# Alignment objects cell by cell.
+
+COL_SPAN = 8            # columns A..H covered by titles, banners and separators
+COLUMN_WIDTH = 20
+COLUMN_LETTERS = [get_column_letter(col) for col in range(1, COL_SPAN + 1)]
+
+THIN = Side(style="thin", color="000000")
+BOX_BORDER = Border(left=THIN, right=THIN, top=THIN, bottom=THIN)
+BOLD = Font(bold=True)
+BANNER_FILL = PatternFill(start_color="D9E1F2", end_color="D9E1F2", fill_type="solid")
+
+
+def _wrap(horizontal=None, vertical=None):
+    # Every written cell in the summary wraps its text
+    return Alignment(horizontal=horizontal, vertical=vertical, wrap_text=True)
+
+
+STYLES = {
+    "Report Text": dict(font=DEFAULT_FONT, alignment=_wrap()),
+    "Report Label": dict(font=BOLD, alignment=_wrap()),
+    "Report Separator": dict(font=DEFAULT_FONT, border=Border(bottom=THIN), alignment=_wrap()),
+    "Report Banner": dict(font=BOLD, fill=BANNER_FILL, alignment=_wrap("center", "center")),
+    "Report Title Left": dict(font=BOLD, alignment=_wrap("left", "center")),
+    "Report Title Center": dict(font=BOLD, alignment=_wrap("center", "center")),
+    "Report Segment Title": dict(font=DEFAULT_FONT, alignment=_wrap("center", "center")),
+    "Report Summary Line": dict(font=BOLD, alignment=_wrap("left")),
+    "Table Header Left": dict(font=BOLD, border=BOX_BORDER, alignment=_wrap("left", "top")),
+    "Table Header Center": dict(font=BOLD, border=BOX_BORDER, alignment=_wrap("center", "top")),
+    "Table Cell Left": dict(font=DEFAULT_FONT, border=BOX_BORDER, alignment=_wrap("left", "top")),
+    "Table Cell Center": dict(font=DEFAULT_FONT, border=BOX_BORDER, alignment=_wrap("center", "top")),
+    "Matrix Header": dict(font=BOLD, border=BOX_BORDER, alignment=_wrap()),
+    "Matrix Label": dict(font=DEFAULT_FONT, border=BOX_BORDER, alignment=_wrap()),
+    "Matrix Label Bold": dict(font=BOLD, border=BOX_BORDER, alignment=_wrap()),
+    "Matrix Value": dict(font=DEFAULT_FONT, border=BOX_BORDER, alignment=_wrap("center", "top")),
+    "Matrix Value Bold": dict(font=BOLD, border=BOX_BORDER, alignment=_wrap("center", "top")),
+    "Referral Value": dict(font=DEFAULT_FONT, border=BOX_BORDER, alignment=_wrap("center")),
+    "Referral Value Bold": dict(font=BOLD, border=BOX_BORDER, alignment=_wrap("center")),
+}
+
+TABLE_STYLES = {
+    # align -> (header style, cell style)
+    "left": ("Table Header Left", "Table Cell Left"),
+    "center": ("Table Header Center", "Table Cell Center"),
+}
+
+
+@dataclass(frozen=True)
+class TableRange:
+    # Where a table landed on the sheet, as returned by the table writers
+    header_row: int
+    last_row: int           # == header_row when the table has no data rows
+    first_col: int
+    num_cols: int
+
+    @property
+    def first_row(self):
+        return self.header_row + 1
+
+    @property
+    def last_col(self):
+        return self.first_col + self.num_cols - 1
+
+
+class SheetBuilder:
+    # Writes a sheet top to bottom. The builder owns the row cursor, so
+    # nothing asks openpyxl for ws.max_row (a scan of every cell); spacers
+    # only move the cursor instead of creating empty cells, and merged rows
+    # are collected and merged in one pass by finish().
+
+    def __init__(self, ws, col_span=COL_SPAN):
+        self.ws = ws
+        self.col_span = col_span
+        self.row = 0
+        self.max_col = 0
+        self._merged_rows = []
+
+    def spacer(self, rows=1):
+        self.row += rows
+
+    def cells(self, values, start_col=1, style="Report Text"):
+        # One row of values starting at start_col, every cell styled
+        self.row += 1
+        for col, value in enumerate(values, start_col):
+            self.ws.cell(row=self.row, column=col, value=value).style = style
+        self.max_col = max(self.max_col, start_col + len(values) - 1)
+        return self.row
+
+    def merged(self, text, style):
+        # Text in column A, merged across the sheet's column span
+        self.row += 1
+        self.ws.cell(row=self.row, column=1, value=text).style = style
+        self._merged_rows.append(self.row)
+        self.max_col = max(self.max_col, self.col_span)
+        return self.row
+
+    def title(self, text, align="center"):
+        return self.merged(text, "Report Title Left" if align == "left" else "Report Title Center")
+
+    def banner(self, text):
+        self.spacer()
+        self.merged(text, "Report Banner")
+        self.spacer()
+
+    def summary_line(self, text):
+        return self.merged(text, "Report Summary Line")
+
+    def rule(self):
+        # Separator line: bottom border across the column span
+        return self.cells([None] * self.col_span, style="Report Separator")
+
+    def table(self, header, rows, start_col=1):
+        # Header + data rows (unstyled; see format_table & co.), returns
+        # where they landed
+        ws = self.ws
+        header_row = self.row + 1
+        for values in (header, *rows):
+            self.row += 1
+            for col, value in enumerate(values, start_col):
+                ws.cell(row=self.row, column=col, value=value)
+        self.max_col = max(self.max_col, start_col + len(header) - 1)
+        return TableRange(header_row, self.row, start_col, len(header))
+
+    def finish(self):
+        for row in self._merged_rows:
+            self.ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=self.col_span)
+        self._merged_rows = []
+
+        # Fixed width-20 columns
+        for col in range(1, max(self.max_col, self.col_span) + 1):
+            letter = COLUMN_LETTERS[col - 1] if col <= len(COLUMN_LETTERS) else get_column_letter(col)
+            self.ws.column_dimensions[letter].width = COLUMN_WIDTH
+
+
+def register_styles(wb):
+    # NamedStyle objects bind to a single workbook, so each workbook gets its
+    # own copies of the shared definitions
+    for name, attrs in STYLES.items():
+        if name not in wb.named_styles:
+            wb.add_named_style(NamedStyle(name=name, **attrs))
+
+
+def write_report_header(sheet, report_begin, report_end):
+    # 📅 Reporting period (MM/DD/YYYY) and the separator line across A to H
+    sheet.cells(["Period:", "From", "To"], style="Report Label")
+    sheet.cells([report_begin.strftime("%m/%d/%Y"), report_end.strftime("%m/%d/%Y")], start_col=2)
+    sheet.rule()
+
+    # Spacer row after the line
+    sheet.spacer()
@@ -0,0 +1,85 @@
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import admission
+import monday_client
+import report_cache
+from mirror import get_mirror
+from report_config import get_config
+
+# Pre-generates the recurring report windows listed under "schedules" in
+# report_config.json shortly before people ask for them (e.g. Monday 08:30
+# for last Monday -> today), after re-syncing the boards, so the Monday
+# morning rush is served from the report cache.
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_ENABLED = os.environ.get("SCHEDULER_ENABLED", "1") != "0"
+CHECK_SECONDS = int(os.environ.get("SCHEDULER_CHECK_SECONDS", 30))
+# A schedule that was missed (e.g. the instance was asleep) still runs if we
+# come up within this many minutes of its time.
+GRACE_MINUTES = int(os.environ.get("SCHEDULER_GRACE_MINUTES", 60))
+
+_last_run = {}
+
+
+def due_schedules(config, now):
+    for schedule in config.schedules:
+        if now.weekday() not in schedule.weekdays:
+            continue
+        hour, minute = schedule.at
+        scheduled = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if scheduled <= now < scheduled + timedelta(minutes=GRACE_MINUTES) \
+                and _last_run.get(schedule.name) != now.date():
+            yield schedule
+
+
+def run_schedule(schedule, run_date):
+    config = get_config()
+    boards = config.resolve_boards(list(schedule.board_ids) or None)
+
+    # Pre-sync the snapshot so the warmed report reflects the board right now
+    mirror = get_mirror()
+    api_key = monday_client.get_api_key()
+    mirror.refresh_stale(api_key)
+    for board in boards:
+        mirror.reconcile_board(board.id, api_key)
+
+    start_date = run_date - timedelta(days=schedule.days)
+    report_cache.get_report(start_date, run_date, [board.id for board in boards], priority=admission.BATCH)
+    logger.info("Pre-generated %s report for %s -> %s", schedule.name, start_date, run_date)
+
+
+def run_pending(now=None):
+    config = get_config()
+    now = now or datetime.now(ZoneInfo(config.timezone))
+    for schedule in list(due_schedules(config, now)):
+        _last_run[schedule.name] = now.date()
+        try:
+            run_schedule(schedule, now.date())
+        except Exception:
+            logger.exception("Scheduled report %s failed", schedule.name)
+
+
+def _scheduler_loop():
+    while True:
+        try:
+            run_pending()
+        except Exception:
+            logger.exception("Report scheduler failed")
+        time.sleep(CHECK_SECONDS)
+
+
+_scheduler = None
+
+
+def start_scheduler():
+    global _scheduler
+    if not SCHEDULER_ENABLED or (_scheduler is not None and _scheduler.is_alive()):
+        return
+    _scheduler = threading.Thread(target=_scheduler_loop, name="report-scheduler", daemon=True)
+    _scheduler.start()
@@ -0,0 +1,102 @@
+import threading
+import time
+
+import pytest
+
+import admission
+from admission import BATCH, INTERACTIVE, AdmissionController, AdmissionRejected
+
+
+class Builds:
+    # Report builds in threads; the first one holds its slot until released
+    def __init__(self, controller):
+        self.controller = controller
+        self.started = []
+        self.rejected = []
+        self.release = threading.Event()
+        self.threads = []
+
+    def start(self, name, cost, priority=INTERACTIVE):
+        # Returns once the build runs, waits in the queue or was turned away
+        queued = self.controller.status()["queued"]
+
+        def build():
+            try:
+                with self.controller.admit(cost, priority):
+                    self.started.append(name)
+                    if len(self.started) == 1:
+                        self.release.wait(5)
+            except AdmissionRejected as e:
+                self.rejected.append((name, e.retry_after))
+
+        thread = threading.Thread(target=build)
+        thread.start()
+        self.threads.append(thread)
+        wait_for(lambda: name in self.started or name in dict(self.rejected)
+                 or self.controller.status()["queued"] > queued)
+
+    def finish(self):
+        self.release.set()
+        for thread in self.threads:
+            thread.join()
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def test_interactive_and_cheap_builds_go_first():
+    builds = Builds(AdmissionController(memory_budget=100, max_concurrent=1))
+    builds.start("running", 10)
+    builds.start("batch", 5, BATCH)
+    builds.start("large", 50)
+    builds.start("small", 10)
+    builds.finish()
+    assert builds.started == ["running", "small", "large", "batch"]
+
+
+def test_aged_builds_go_first(monkeypatch):
+    monkeypatch.setattr(admission, "AGING_SECONDS", 0.1)
+    builds = Builds(AdmissionController(memory_budget=100, max_concurrent=1))
+    builds.start("running", 10)
+    builds.start("batch", 5, BATCH)
+    time.sleep(0.15)
+    builds.start("interactive", 5)
+    builds.finish()
+    assert builds.started == ["running", "batch", "interactive"]
+
+
+def test_builds_share_the_memory_budget():
+    controller = AdmissionController(memory_budget=100, max_concurrent=4)
+    builds = Builds(controller)
+    builds.start("running", 60)
+    builds.start("too big", 60)
+    assert controller.status()["queued"] == 1
+    builds.finish()
+    assert builds.started == ["running", "too big"]
+
+    # A build bigger than the whole budget still runs, on its own
+    with controller.admit(500):
+        assert controller.status()["running"] == 1
+
+
+def test_interactive_builds_are_turned_away_with_retry_after():
+    controller = AdmissionController(memory_budget=100, max_concurrent=1, max_wait=0.1, max_queue=1)
+    builds = Builds(controller)
+    builds.start("running", 10)
+    builds.start("batch", 10, BATCH)        # batch work waits, however long
+    builds.start("queue full", 10)
+    assert [name for name, _ in builds.rejected] == ["queue full"]
+
+    controller.max_queue = 2
+    builds.start("waited too long", 10)
+    wait_for(lambda: len(builds.rejected) == 2)
+    builds.finish()
+
+    assert builds.started == ["running", "batch"]
+    assert [name for name, _ in builds.rejected] == ["queue full", "waited too long"]
+    assert all(retry_after >= 1 for _, retry_after in builds.rejected)
+    assert controller.status()["rejected"] == 2
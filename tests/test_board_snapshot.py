@@ -0,0 +1,52 @@
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+
+import board_snapshot
+import sync
+from mirror import BoardMirror
+from report_config import BoardConfig
+
+
+@pytest.fixture
+def mirror(tmp_path):
+    mirror = BoardMirror(str(tmp_path / "mirror.sqlite3"))
+    with mirror._board_transaction(1) as (conn, version):
+        for index in range(50):
+            values = {"Dept": ["TAX", "COS", ""][index % 3], "Country/Region": "Spain", "Potential": "Hot"}
+            if index % 5:
+                values["Close Date"] = "2024-06-01"
+            mirror._upsert(conn, 1, str(index), f"Deal {index}", values, version, index)
+        conn.execute("UPDATE boards SET synced_at = 1 WHERE board_id = 1")
+    return mirror
+
+
+def mapped_addresses(store):
+    return {
+        buffer.address
+        for _, table in store._mapped.values()
+        for column in table.columns
+        for chunk in column.chunks
+        for buffer in chunk.buffers()
+        if buffer is not None
+    }
+
+
+def test_frame_matches_the_mirror_and_shares_the_mapping(tmp_path, mirror, monkeypatch):
+    boards = [BoardConfig(1, "Enquiries", {"Dept": "Department"})]
+    store = board_snapshot.SnapshotStore(str(tmp_path / "snapshots"))
+    positions = {}
+    df = store.load_frame(boards, mirror, positions)
+
+    monkeypatch.setattr(board_snapshot, "SNAPSHOT_DIR", "")
+    expected_positions = {}
+    expected = sync.load_boards_frame(boards, mirror, expected_positions)
+    assert df.equals(expected)
+    assert list(df.dtypes) == list(expected.dtypes)
+    assert positions == expected_positions
+
+    # The string columns are views of the memory-mapped file, not copies
+    mapped = mapped_addresses(store)
+    for title in ("Item ID", "Item Name", "Department", "Close Date"):
+        chunks = df[title].array._pa_array.chunks
+        assert all(chunk.buffers()[2].address in mapped for chunk in chunks)
@@ -0,0 +1,72 @@
+import random
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+
+import sync
+from deal_intervals import DealIntervals
+from report_config import get_config
+
+
+def make_deals(count=600, seed=0):
+    # Random deals plus the edge cases compute_flags has rules for: missing
+    # or unparseable dates, non-Active statuses, closes before creation
+    rnd = random.Random(seed)
+    first = date(2024, 1, 1)
+    rows = []
+    for index in range(count):
+        created = first + timedelta(days=rnd.randint(0, 365))
+        closed = created + timedelta(days=rnd.randint(-20, 120))
+        rows.append({
+            "Item ID": str(index),
+            "Group Status": rnd.choice(["Active", "Active", "Won", "Lost", None]),
+            "Deal creation date": rnd.choice([str(created)] * 8 + [None, "not a date"]),
+            "Close Date": rnd.choice([str(closed)] * 3 + [None]),
+            "Potential": rnd.choice(["Hot", "Cold", "Warm"]),
+            "Country/Region": rnd.choice(["Brazil", "Spain", "China", "United States", ""]),
+        })
+    return pd.DataFrame(rows)
+
+
+@pytest.fixture(scope="module")
+def deals():
+    raw = make_deals()
+    parsed = sync.parse_deal_dates(raw.copy())
+    desks = sync.classify_desks(parsed["Country/Region"], get_config()).to_numpy()
+    return raw, DealIntervals.from_frame(parsed, desks=desks)
+
+
+def flagged(flags, column):
+    return set(flags.loc[flags[column] == 1, "Item ID"])
+
+
+def test_matches_compute_flags_on_random_windows(deals):
+    raw, intervals = deals
+    config = get_config()
+    rnd = random.Random(1)
+    for _ in range(300):
+        begin = date(2023, 12, 1) + timedelta(days=rnd.randint(0, 420))
+        end = begin + timedelta(days=rnd.randint(0, 30))
+        flags = sync.compute_flags(raw.copy(), begin, end)
+
+        expected = {label: int(flags[column].sum()) for label, column in sync.MOVEMENT_METRICS.items()}
+        assert intervals.window(begin, end) == expected
+
+        assert set(intervals.active_at_ids(end)) == flagged(flags, "IsActiveNow")
+        assert set(intervals.active_before_ids(begin)) == flagged(flags, "IsActiveBeforeCutoff")
+        assert set(intervals.added_ids(begin, end)) == flagged(flags, "AdditionAfterCutoff")
+        assert set(intervals.removed_ids(begin, end)) == flagged(flags, "RemovalAfterCutoff")
+
+        desks = sync.classify_desks(flags["Country/Region"], config).to_numpy()
+        for desk in set(desks):
+            in_desk = flags[desks == desk]
+            expected = {label: int(in_desk[column].sum()) for label, column in sync.MOVEMENT_METRICS.items()}
+            assert intervals.for_desk(desk).window(begin, end) == expected
+
+
+def test_windows_cover_the_range(deals):
+    _, intervals = deals
+    windows = list(intervals.windows(date(2024, 1, 1), date(2024, 2, 1), 7))
+    assert [(begin, end) for begin, end, _ in windows][-1] == (date(2024, 1, 29), date(2024, 2, 1))
+    assert windows[0][2] == intervals.window(date(2024, 1, 1), date(2024, 1, 8))
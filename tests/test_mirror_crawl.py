@@ -0,0 +1,86 @@
+import threading
+import time
+
+import pytest
+
+import mirror
+import mock_monday
+import monday_client
+
+BOARD_ID = 42
+ITEMS = 1000
+
+
+@pytest.fixture
+def api(monkeypatch):
+    # A few pages at 0.15s each, so a second crawl can start mid-way
+    server, url = mock_monday.start_server(items=ITEMS, latency=0.15)
+    monkeypatch.setattr(monday_client, "API_URL", url)
+    monkeypatch.setattr(mirror, "CRAWL_RETRY_SECONDS", 0.05)
+    yield server.api
+    server.shutdown()
+
+
+def deleted_count(board_mirror):
+    (count,) = board_mirror._connect().execute(
+        "SELECT COUNT(*) FROM deleted_items WHERE board_id = ?", (BOARD_ID,)
+    ).fetchone()
+    return count
+
+
+def crawl_twice(first, second, delay=0.3):
+    counts = []
+    threads = [
+        threading.Thread(target=lambda: counts.append(first.reconcile_board(BOARD_ID, "test"))),
+        threading.Thread(target=lambda: counts.append(second.reconcile_board(BOARD_ID, "test"))),
+    ]
+    threads[0].start()
+    time.sleep(delay)
+    threads[1].start()
+    for thread in threads:
+        thread.join()
+    return counts
+
+
+def test_overlapping_crawls_in_one_process(api, tmp_path):
+    board_mirror = mirror.BoardMirror(str(tmp_path / "mirror.sqlite3"))
+    assert crawl_twice(board_mirror, board_mirror) == [ITEMS, ITEMS]
+    assert board_mirror.item_count(BOARD_ID) == ITEMS
+    assert deleted_count(board_mirror) == 0
+    assert board_mirror.crawl_progress(BOARD_ID) is None
+
+
+def test_overlapping_crawls_in_two_workers(api, tmp_path):
+    path = str(tmp_path / "mirror.sqlite3")
+    first, second = mirror.BoardMirror(path), mirror.BoardMirror(path)
+    assert crawl_twice(first, second) == [ITEMS, ITEMS]
+    assert first.item_count(BOARD_ID) == ITEMS
+    assert deleted_count(first) == 0
+    # The second crawl waited for the first instead of crawling again
+    assert api.requests < 12
+
+
+def test_expired_lease_is_taken_over(api, tmp_path):
+    board_mirror = mirror.BoardMirror(str(tmp_path / "mirror.sqlite3"))
+    board_mirror._connect().execute(
+        "INSERT INTO crawl_leases (board_id, owner, expires_at) VALUES (?, 'dead worker', ?)",
+        (BOARD_ID, time.time() - 1),
+    )
+    assert board_mirror.reconcile_board(BOARD_ID, "test") == ITEMS
+    assert board_mirror._connect().execute("SELECT COUNT(*) FROM crawl_leases").fetchone() == (0,)
+
+
+@pytest.mark.parametrize("response", [
+    {"data": {"boards": []}},   # the token lost access to the board
+    {"error_message": "Internal server error", "status_code": 500},
+])
+def test_response_without_a_page_fails_the_crawl(api, tmp_path, monkeypatch, response):
+    board_mirror = mirror.BoardMirror(str(tmp_path / "mirror.sqlite3"))
+    assert board_mirror.reconcile_board(BOARD_ID, "test") == ITEMS
+
+    answer = api.answer
+    monkeypatch.setattr(api, "answer", lambda query: (response, 0) if "items_page" in query else answer(query))
+    with pytest.raises(monday_client.MondayAPIError):
+        board_mirror.reconcile_board(BOARD_ID, "test")
+    assert board_mirror.item_count(BOARD_ID) == ITEMS
+    assert deleted_count(board_mirror) == 0
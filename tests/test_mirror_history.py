@@ -0,0 +1,68 @@
+import time
+
+import pytest
+
+import mirror
+import mock_monday
+import monday_client
+
+BOARD_ID = 7
+
+
+@pytest.fixture
+def api(monkeypatch):
+    server, url = mock_monday.start_server(items=300)
+    monkeypatch.setattr(monday_client, "API_URL", url)
+    # Checkpoints every few writes, so reads combine checkpoints and history
+    monkeypatch.setattr(mirror, "HISTORY_CHECKPOINT_EVERY", 40)
+    yield server.api
+    server.shutdown()
+
+
+def board_state(board_mirror, as_of=None):
+    items = board_mirror.iter_items(BOARD_ID) if as_of is None else board_mirror.iter_items_as_of(BOARD_ID, as_of)
+    return [(item_id, name, values) for item_id, name, values, _ in items]
+
+
+def mark():
+    # A moment strictly between two writes
+    time.sleep(0.01)
+    moment = time.time()
+    time.sleep(0.01)
+    return moment
+
+
+def test_as_of_reads_match_the_board_at_the_time(api, tmp_path):
+    board_mirror = mirror.BoardMirror(str(tmp_path / "mirror.sqlite3"))
+    board_mirror.reconcile_board(BOARD_ID, "test")
+    items = api.board(BOARD_ID)
+    states = [(mark(), board_state(board_mirror))]
+
+    for item in items[:60:3]:
+        board_mirror.apply_event({
+            "type": "update_column_value", "boardId": BOARD_ID, "pulseId": item["id"],
+            "columnTitle": "Group Status", "value": {"label": {"text": "Won"}},
+        })
+    board_mirror.apply_event({"type": "change_name", "boardId": BOARD_ID, "pulseId": items[5]["id"], "value": "Renamed"})
+    board_mirror.apply_event({"type": "delete_pulse", "boardId": BOARD_ID, "pulseId": items[8]["id"]})
+    states.append((mark(), board_state(board_mirror)))
+
+    # The crawl puts the board back the way monday.com has it, plus its own changes
+    items[1] = dict(items[1], name="Crawled rename")
+    del items[20]
+    items.append(dict(items[0], id="99", name="Crawled new"))
+    board_mirror.reconcile_board(BOARD_ID, "test")
+    states.append((mark(), board_state(board_mirror)))
+
+    for moment, state in states:
+        assert board_state(board_mirror, moment) == state
+
+    # Compacting up to the second state keeps every read from then on
+    started = board_mirror.history_start(BOARD_ID)
+    compact_at = states[1][0]
+    assert board_mirror.compact_history(BOARD_ID, (time.time() - compact_at) / 86400) > 0
+    assert started < board_mirror.history_start(BOARD_ID) <= compact_at
+    for moment, state in states[1:]:
+        assert board_state(board_mirror, moment) == state
+    with pytest.raises(ValueError):
+        board_state(board_mirror, started)
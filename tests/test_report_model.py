@@ -0,0 +1,111 @@
+import random
+from datetime import date
+
+import pytest
+
+import board_snapshot
+import sync
+from mirror import BoardMirror
+from report_config import BoardConfig, get_config
+
+BOARD_ID = 1
+BEGIN, END = date(2024, 6, 3), date(2024, 6, 10)
+
+
+def item_values(rnd):
+    created = date(2024, rnd.randint(1, 7), rnd.randint(1, 28))
+    status = rnd.choice(["Active", "Active", "Won", "Lost"])
+    values = {
+        "Dept": rnd.choice(["COS", "CCT-GBA", "AG2", "TAX", "Other", ""]),
+        "Country/Region": rnd.choice(["Spain", "Germany", "United States", "China", "Brazil", ""]),
+        "Salesperson": rnd.choice(["Ann", "Bob", "Cid", ""]),
+        "Service": rnd.choice(["Audit", "Tax", "Advisory"]),
+        "Stage": rnd.choice(["Lead", "Proposal"]),
+        "Referral Source Category": rnd.choice(["Web", "Partner", "Event"]),
+        "Group Status": status,
+        "Potential": rnd.choice(["Hot", "Cold"]),
+        "Deal creation date": str(created),
+    }
+    if status != "Active":
+        values["Close Date"] = str(date(2024, 6, rnd.randint(1, 14)))
+    return values
+
+
+def write_board(board_mirror, items):
+    # items: [(item_id, name, values)] in board order, as a crawl writes them
+    with board_mirror._board_transaction(BOARD_ID) as (conn, version):
+        for position, (item_id, name, values) in enumerate(items, 1):
+            board_mirror._upsert(conn, BOARD_ID, item_id, name, values, version, position)
+        conn.execute("UPDATE boards SET synced_at = 1 WHERE board_id = ?", (BOARD_ID,))
+
+
+@pytest.fixture
+def board(tmp_path, monkeypatch):
+    monkeypatch.setattr(board_snapshot, "SNAPSHOT_DIR", "")
+    rnd = random.Random(7)
+    items = [(str(index), f"Deal {index}", item_values(rnd)) for index in range(400)]
+    board_mirror = BoardMirror(str(tmp_path / "mirror.sqlite3"))
+    write_board(board_mirror, items)
+    return board_mirror, items, rnd
+
+
+def build(board_mirror):
+    return sync.build_report_model(BEGIN, END, [BoardConfig(BOARD_ID, "Enquiries")], board_mirror, get_config())
+
+
+def assert_matches_rebuild(model, board_mirror):
+    assert sync.update_report_model(model, board_mirror, max_change_ratio=1)
+    expected = build(board_mirror)
+    assert list(model.frame.index) == list(expected.frame.index)
+    assert model.frame.astype(object).equals(expected.frame.astype(object))
+    assert {group: +counter for group, counter in model.counts.items() if +counter} == \
+        {group: +counter for group, counter in expected.counts.items() if +counter}
+    assert {key: members for key, members in model.sections.items() if members} == \
+        {key: members for key, members in expected.sections.items() if members}
+    assert {item_id: model.positions[item_id] for item_id in model.frame.index} == expected.positions
+
+
+def test_upserts_and_deletes_match_a_rebuild(board):
+    board_mirror, items, rnd = board
+    model = build(board_mirror)
+
+    for item_id in rnd.sample(range(400), 20):
+        board_mirror.apply_event({
+            "type": "update_column_value", "boardId": BOARD_ID, "pulseId": item_id,
+            "columnTitle": "Group Status", "value": {"label": {"text": rnd.choice(["Won", "Lost"])}},
+        })
+    board_mirror.apply_event({"type": "change_name", "boardId": BOARD_ID, "pulseId": 5, "value": {"name": "Renamed"}})
+    for item_id in (3, 77, 250):
+        board_mirror.apply_event({"type": "delete_pulse", "boardId": BOARD_ID, "pulseId": item_id})
+    assert_matches_rebuild(model, board_mirror)
+
+
+def test_moves_match_a_rebuild(board):
+    board_mirror, items, rnd = board
+    model = build(board_mirror)
+
+    # A crawl that finds the board re-sorted, a few items gone and one
+    # added near the top
+    for item_id in ("3", "77", "250"):
+        board_mirror.apply_event({"type": "delete_pulse", "boardId": BOARD_ID, "pulseId": item_id})
+    items = [item for item in items if item[0] not in ("3", "77", "250")]
+    rnd.shuffle(items)
+    items.insert(2, ("new", "New deal", item_values(rnd)))
+    write_board(board_mirror, items)
+    assert_matches_rebuild(model, board_mirror)
+    assert list(model.frame.index) == [item_id for item_id, _, _ in items if item_id in model.frame.index]
+
+
+def test_updates_without_moves_skip_the_positions(board, monkeypatch):
+    board_mirror, items, rnd = board
+    model = build(board_mirror)
+    write_board(board_mirror, items[::-1])
+    assert_matches_rebuild(model, board_mirror)
+
+    def item_positions(board_id):
+        raise AssertionError("positions re-read without a move")
+
+    monkeypatch.setattr(board_mirror, "item_positions", item_positions)
+    board_mirror.apply_event({"type": "change_name", "boardId": BOARD_ID, "pulseId": 9, "value": {"name": "Renamed"}})
+    board_mirror.apply_event({"type": "create_pulse", "boardId": BOARD_ID, "pulseId": 9999, "pulseName": "Placeholder"})
+    assert_matches_rebuild(model, board_mirror)